@@ -1,60 +1,489 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Blueprint, Flask, request, jsonify, send_from_directory, Response, stream_with_context
 from flask_cors import CORS
+from io import BytesIO
+import hashlib
+import json
+import logging
+import os
+import queue
+import uuid
 
-# Helper scripts
-from dataPrep import clean_and_build_dataset
-from getPredictions import get_times, seconds_to_time
+# Helper scripts. The pipeline modules (pandas, numpy, the DB client) are
+# imported inside the handlers that need them so the service starts fast.
+from uploadJobs import UploadJobQueue, QueueFull, JOB_FAILED
+from uploadCache import UploadResultCache, file_digest
+from pipelineMetrics import metrics
+from pipelineLimits import PipelineLimiter, UserBusy, PipelineBusy, PIPELINE_WAIT
 
-app = Flask(__name__)
-CORS(app)
+logging.basicConfig(level=os.getenv('LOG_LEVEL', 'INFO'), format='%(asctime)s %(levelname)s %(name)s %(message)s')
+logger = logging.getLogger("stryde.app")
 
-app = Flask(__name__)
-CORS(app)
+routes = Blueprint('stryde', __name__)
 
-@app.route('/')
+@routes.route('/')
 def serve_index():
     return send_from_directory('user-interface', 'home.html')
 
-@app.route('/<path:filename>')
+@routes.route('/<path:filename>')
 def serve_static(filename):
     return send_from_directory('user-interface', filename)
 
-@app.route('/api/upload-data', methods=['POST'])
+upload_jobs = UploadJobQueue()
+upload_cache = UploadResultCache()
+# /api/summary responses recomputed from stored runs. Kept apart from
+# upload_cache so caching a summary never evicts the user's upload digest.
+summary_cache = UploadResultCache()
+pipeline_limits = PipelineLimiter()
+
+# Which athlete a request is for. By default every request is the single
+# athlete STRYDE_DEFAULT_USER (the original hard-coded id). X-User-Id is only
+# honoured with STRYDE_TRUST_USER_HEADER=1, for deployments where an
+# authenticating proxy sets it and strips any client-supplied value; the API
+# itself does not authenticate, so an untrusted header would let any caller
+# read or overwrite any athlete's data.
+DEFAULT_USER = os.getenv('STRYDE_DEFAULT_USER', 'cb6541ac-4f5f-48ce-9f59-87260d595a27')
+TRUST_USER_HEADER = os.getenv('STRYDE_TRUST_USER_HEADER') == '1'
+MISSING_USER = {'error': 'X-User-Id header must be a user id'}, 401
+
+def request_user():
+    """The requesting athlete's id (a UUID string), or None if missing or malformed."""
+    # In trust mode a request without the header is unidentified, never the default athlete
+    user = request.headers.get('X-User-Id') if TRUST_USER_HEADER else DEFAULT_USER
+    try:
+        return str(uuid.UUID(user)) if user else None
+    except ValueError:
+        return None
+
+def busy_response(error):
+    if isinstance(error, UserBusy):
+        return {'error': 'An upload for this user is still being processed, retry shortly'}, 429, {'Retry-After': '5'}
+    return {'error': 'Too many uploads in progress, retry shortly'}, 503, {'Retry-After': '5'}
+
+def prediction_payload(vdot, avg_hr):
+    from getPredictions import get_times, seconds_to_time
+
+    with metrics.stage("interpolation", rows_in=1) as stage:
+        times = get_times(vdot)
+        stage.rows_out = 1
+
+    return {
+        'vdot': vdot,
+        'avg_hr': avg_hr,
+        'fivek_time': seconds_to_time(times['5000']),
+        'half_time': seconds_to_time(times['1/2 Marathon']),
+        'full_time': seconds_to_time(times['Marathon']),
+    }
+
+def build_upload_response(result):
+    vdot = result[0]
+    avg_hr = result[1]
+    write_summary = result[2]
+
+    return dict(prediction_payload(vdot, avg_hr), db_writes=write_summary, success=True)
+
+def queued_writes_ok(user, db_writes):
+    """False if any write-behind write in `db_writes` was deferred or is otherwise not on its way to the DB."""
+    queued = [s for s in db_writes.values() if s.get('status') == 'queued']
+    if not queued:
+        return True
+    from dataPrep import write_behind
+    return all(write_behind.write_state(s['table'], user, s['task_id']) is not None for s in queued)
+
+def cached_upload_response(user, digest):
+    """The stored response if this user's last upload was the same file, else None."""
+    response = upload_cache.get(user, digest)
+    if response is None:
+        return None
+    if not queued_writes_ok(user, response['db_writes']):
+        # Its writes never landed: run the upload again so they are resubmitted
+        upload_cache.invalidate(user)
+        return None
+    return dict(response, db_writes={}, cached=True)
+
+def process_upload(file_stream, digest, user, write_mode=None, progress=None, wait=PIPELINE_WAIT):
+    """
+    Run (or serve from cache) `user`'s upload inside their pipeline slot,
+    waiting at most `wait` seconds for it (None: as long as it takes).
+    """
+    from dataPrep import clean_and_build_dataset
+
+    with pipeline_limits.slot(user, timeout=wait):
+        # Checked under the user's lock: a run that just finished may have cached this file
+        response = cached_upload_response(user, digest)
+        if response is not None:
+            if progress is not None:
+                progress("prediction", vdot=response['vdot'], avg_hr=response['avg_hr'])
+            return response
+
+        # Whatever happens next changes this user's stored data
+        upload_cache.invalidate(user)
+        summary_cache.invalidate(user)
+        result = clean_and_build_dataset(file_stream=file_stream, user=user, write_mode=write_mode, progress=progress)
+        response = dict(build_upload_response(result), cached=False)
+        if all(summary['failed'] == 0 for summary in response['db_writes'].values()):
+            upload_cache.put(user, digest, response)
+        return response
+
+def validate_upload():
+    """(file, ?write mode, None) for a valid CSV upload, else (None, None, error response)."""
+    if 'file' not in request.files:
+        return None, None, ('{"error":"No file"}', 400)
+
+    file = request.files['file']
+    if file.filename == '':
+        return None, None, ('{"error":"No file selected"}', 400)
+
+    if not file.filename.endswith('.csv'):
+        return None, None, ('{"error":"Not CSV"}', 400)
+
+    # ?write=sync|diff write only the activities that changed (see dataPrep.RUNDATA_WRITE_MODE)
+    write_mode = request.args.get('write')
+    if write_mode not in (None, 'sync', 'diff', 'replace'):
+        return None, None, ({'error': 'write must be "sync", "diff" or "replace"'}, 400)
+    return file, write_mode, None
+
+def run_upload_job(data, user, write_mode=None):
+    return process_upload(BytesIO(data), hashlib.sha256(data).hexdigest(), user, write_mode=write_mode, wait=None)
+
+@routes.route('/api/upload-data', methods=['POST'])
 def upload_data():
     try:
+        user = request_user()
+        if user is None:
+            return MISSING_USER
+        file, write_mode, error = validate_upload()
+        if error is not None:
+            return error
+
+        if request.args.get('async') in ('1', 'true'):
+            # The request's file handle closes with the response, so hand the
+            # worker the raw bytes.
+            data = file.read()
+            response = cached_upload_response(user, hashlib.sha256(data).hexdigest())
+            if response is not None:
+                return response, 200
+            try:
+                job_id = upload_jobs.submit(run_upload_job, data, user, write_mode, owner=user)
+            except QueueFull:
+                return {'error': 'Too many uploads in progress, retry shortly'}, 503, {'Retry-After': '5'}
+            return {'job_id': job_id, 'status_url': f'/api/jobs/{job_id}'}, 202
+
+        return process_upload(file, file_digest(file.stream), user, write_mode=write_mode), 200
+    except (UserBusy, PipelineBusy) as e:
+        return busy_response(e)
+    except Exception:
+        logger.exception("Request to %s failed", request.path)
+        return '{"error":"error"}', 500
+
+# Seconds between keep-alive comments on an idle progress stream
+STREAM_HEARTBEAT = float(os.getenv('STREAM_HEARTBEAT', 15))
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+def run_streamed_upload(data, user, write_mode, events):
+    """Upload job that reports into `events`, ending with a "done" or "error" event."""
+    def progress(event, **payload):
+        if event == "prediction":
+            payload = prediction_payload(payload['vdot'], payload['avg_hr'])
+        events.put((event, payload))
+
+    try:
+        response = process_upload(BytesIO(data), hashlib.sha256(data).hexdigest(), user,
+                                  write_mode=write_mode, progress=progress, wait=None)
+    except Exception:
+        # Re-raised so the job queue logs the traceback and marks the job failed
+        events.put(("error", {'error': JOB_FAILED}))
+        raise
+    events.put(("done", response))
+    return response
+
+@routes.route('/api/upload-data/stream', methods=['POST'])
+def upload_data_stream():
+    """
+    Same upload as /api/upload-data, answered as a server-sent event stream:
+    "stage" events with row counts as each pipeline stage finishes, a
+    "prediction" event with VDOT and race times before the database writes
+    start, then "done" with the full response (or "error"). With write-behind
+    persistence (dataPrep.write_behind) "done" follows as soon as the writes
+    are queued.
+    """
+    user = request_user()
+    if user is None:
+        return MISSING_USER
+    file, write_mode, error = validate_upload()
+    if error is not None:
+        return error
+
+    events = queue.Queue()
+    try:
+        job_id = upload_jobs.submit(run_streamed_upload, file.read(), user, write_mode, events, owner=user)
+    except QueueFull:
+        return {'error': 'Too many uploads in progress, retry shortly'}, 503, {'Retry-After': '5'}
+
+    def stream():
+        yield sse_event("started", {'job_id': job_id})
+        while True:
+            try:
+                event, payload = events.get(timeout=STREAM_HEARTBEAT)
+            except queue.Empty:
+                yield ": keep-alive\n\n"
+                continue
+            yield sse_event(event, payload)
+            if event in ("done", "error"):
+                return
+
+    # The job keeps running if the client goes away; its result stays pollable at /api/jobs/<id>
+    return Response(stream_with_context(stream()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@routes.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Poll an async upload. The result is included once the job is done."""
+    job = upload_jobs.get(job_id)
+    # Another user's job is reported as unknown rather than forbidden
+    if job is None or job['owner'] != request_user():
+        return {'error': 'Unknown job'}, 404
+
+    body = {'job_id': job_id, 'status': job['status']}
+    if job['status'] == 'done':
+        body['result'] = job['result']
+    elif job['status'] == 'failed':
+        body['error'] = job['error']
+    return body, 200
+
+@routes.route('/api/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    job = upload_jobs.get(job_id)
+    if job is None or job['owner'] != request_user():
+        return {'error': 'Unknown job'}, 404
+    if job['status'] == 'done':
+        return job['result'], 200
+    if job['status'] == 'failed':
+        return {'error': job['error']}, 500
+    return {'job_id': job_id, 'status': job['status']}, 202
+
+@routes.route('/api/forecast', methods=['POST'])
+def forecast():
+    """
+    VDOT and race-time projections for several horizons from one model fit.
+    Takes the same CSV upload as /api/upload-data plus ?horizons=1,3,6,12
+    (months) and does not write to the database.
+    """
+    try:
+        user = request_user()
+        if user is None:
+            return MISSING_USER
         if 'file' not in request.files:
             return '{"error":"No file"}', 400
-        
+
         file = request.files['file']
-        if file.filename == '':
-            return '{"error":"No file selected"}', 400
-        
         if not file.filename.endswith('.csv'):
             return '{"error":"Not CSV"}', 400
-        
-        result = clean_and_build_dataset(file_stream=file)
-        vdot = result[0]
-        avg_hr = result[1]
 
-        times = get_times(vdot)
-        print(times)
-
-        return {
-            'vdot': vdot,
-            'avg_hr': avg_hr,
-            'fivek_time': seconds_to_time(times['5000']),
-            'half_time': seconds_to_time(times['1/2 Marathon']),
-            'full_time': seconds_to_time(times['Marathon']),
-            'success': True
-        }, 200
-    except Exception as e:
-        print(f"ERROR: {str(e)}")
+        try:
+            horizons = [int(h) for h in request.args.get('horizons', '1,3,6,12').split(',')]
+        except ValueError:
+            return {'error': 'horizons must be a comma-separated list of months'}, 400
+        if not horizons or len(horizons) > 24 or min(horizons) < 1 or max(horizons) > 24:
+            return {'error': 'horizons must be between 1 and 24 months (at most 24 values)'}, 400
+
+        from dataPrep import build_forecast_inputs
+        from vdot_ml_model.variableVdotPredictor_v2 import forecast_vdot_horizons
+
+        with pipeline_limits.slot(user, timeout=PIPELINE_WAIT):
+            clean_data, vdot_data = build_forecast_inputs(file_stream=file, user=user)
+            if vdot_data.empty:
+                return {'error': 'No race-like efforts found in data'}, 422
+
+            result = forecast_vdot_horizons(vdot_data, clean_data, horizons=horizons)
+        if 'error' in result:
+            # The predictor reports a failed fit (too few months for ARIMA, etc.) as a dict
+            logger.warning("Forecast for %s failed: %s", user, result['error'])
+            return {'error': 'Not enough training history to forecast'}, 422
+        return result, 200
+    except (UserBusy, PipelineBusy) as e:
+        return busy_response(e)
+    except Exception:
+        logger.exception("Request to %s failed", request.path)
+        return '{"error":"error"}', 500
+
+def parse_columns(allowed):
+    """?columns=a,b projection, defaulting to every allowed column; None if any is unknown."""
+    requested = request.args.get('columns')
+    if not requested:
+        return list(allowed)
+    columns = [c.strip() for c in requested.split(',') if c.strip()]
+    if not columns or any(c not in allowed for c in columns):
+        return None
+    if 'start_date' not in columns:
+        columns.insert(0, 'start_date')
+    return columns
+
+@routes.route('/api/runs', methods=['GET'])
+def stored_runs():
+    """
+    A page of the user's stored runs, oldest first, without re-uploading.
+    ?page=1&page_size=100&columns=start_date,distance_km&since=2024-01-01&until=2024-07-01
+    `total` is counted for the first page, or for any page with ?count=1.
+    """
+    try:
+        user = request_user()
+        if user is None:
+            return MISSING_USER
+        from dbReaders import fetch_runs_page, parse_bound, RUNDATA_COLUMNS
+
+        try:
+            page = int(request.args.get('page', 1))
+            page_size = int(request.args.get('page_size', 100))
+        except ValueError:
+            return {'error': 'page and page_size must be integers'}, 400
+        if page < 1 or not 1 <= page_size <= 1000:
+            return {'error': 'page must be >= 1 and page_size between 1 and 1000'}, 400
+
+        columns = parse_columns(RUNDATA_COLUMNS)
+        if columns is None:
+            return {'error': f'columns must be a subset of {RUNDATA_COLUMNS}'}, 400
+
+        try:
+            since = parse_bound(request.args.get('since'))
+            until = parse_bound(request.args.get('until'))
+        except ValueError:
+            return {'error': 'since and until must be dates, e.g. 2024-01-01'}, 400
+
+        count = page == 1 or request.args.get('count') in ('1', 'true')
+        rows, total = fetch_runs_page(user, offset=(page - 1) * page_size, limit=page_size, columns=columns,
+                                      since=since, until=until, count=count)
+        return {'runs': rows, 'page': page, 'page_size': page_size, 'total': total}, 200
+    except Exception:
+        logger.exception("Request to %s failed", request.path)
+        return '{"error":"error"}', 500
+
+@routes.route('/api/recent-activity', methods=['GET'])
+def recent_activity():
+    """
+    The user's stored 30-day training features. If the row is missing it is
+    rebuilt from the stored runs and written back.
+    """
+    try:
+        user = request_user()
+        if user is None:
+            return MISSING_USER
+        from dataPrep import recent_activity_frame, write_recent_activity_to_db
+        from dbReaders import fetch_recent_activity, load_activity_store, RECENT_ACTIVITY_COLUMNS
+        from vdot_ml_model.incrementalRollingFeatures import update_user_rolling_features
+
+        columns = parse_columns(RECENT_ACTIVITY_COLUMNS)
+        if columns is None:
+            return {'error': f'columns must be a subset of {RECENT_ACTIVITY_COLUMNS}'}, 400
+
+        row = fetch_recent_activity(user, columns=columns)
+        if row is not None:
+            return {'recent_activity': row, 'source': 'db'}, 200
+
+        with pipeline_limits.slot(user, timeout=PIPELINE_WAIT):
+            runs = load_activity_store(user)
+            rolling = update_user_rolling_features(user, runs) if not runs.empty else None
+            if rolling is None or rolling.empty:
+                return {'error': 'No stored runs for this user'}, 404
+
+            recent = recent_activity_frame(rolling)
+            write_recent_activity_to_db(recent, user)
+        return {'recent_activity': recent[columns].to_dict(orient='records')[0], 'source': 'recomputed'}, 200
+    except (UserBusy, PipelineBusy) as e:
+        return busy_response(e)
+    except Exception:
+        logger.exception("Request to %s failed", request.path)
+        return '{"error":"error"}', 500
+
+@routes.route('/api/summary', methods=['GET'])
+def stored_summary():
+    """
+    VDOT, avg HR and race times without a re-upload: the last upload's
+    response when it is still cached, otherwise recomputed from stored runs.
+    """
+    try:
+        user = request_user()
+        if user is None:
+            return MISSING_USER
+        from dataPrep import summarize_stored_runs, recent_activity_frame, write_recent_activity_to_db
+        from dbReaders import fetch_recent_activity, load_activity_store
+
+        response = upload_cache.latest(user)
+        if response is None:
+            response = summary_cache.latest(user)
+        if response is not None:
+            return dict(response, db_writes={}, cached=True, source='cache'), 200
+
+        with pipeline_limits.slot(user, timeout=PIPELINE_WAIT):
+            runs = load_activity_store(user)
+            if runs.empty:
+                return {'error': 'No stored runs for this user'}, 404
+
+            vdot, avg_hr, rolling = summarize_stored_runs(runs, user)
+            write_summary = {}
+            if not rolling.empty and fetch_recent_activity(user, columns=['start_date']) is None:
+                write_summary['RecentActivity'] = write_recent_activity_to_db(recent_activity_frame(rolling), user)
+
+            response = dict(build_upload_response((vdot, avg_hr, write_summary)), cached=False)
+            summary_cache.put(user, None, response)
+        return dict(response, source='recomputed'), 200
+    except (UserBusy, PipelineBusy) as e:
+        return busy_response(e)
+    except Exception:
+        logger.exception("Request to %s failed", request.path)
         return '{"error":"error"}', 500
 
-@app.route('/api/health', methods=['GET'])
+@routes.route('/api/metrics', methods=['GET'])
+def pipeline_metrics():
+    """Per-stage pipeline timings, row counts and memory in Prometheus text format"""
+    from dataPrep import write_behind
+
+    lines = [
+        "# HELP stryde_write_behind_pending Background DB writes queued or in flight.",
+        "# TYPE stryde_write_behind_pending gauge",
+        f"stryde_write_behind_pending {write_behind.pending()}",
+        "# HELP stryde_write_behind_deferred Background DB writes waiting for a retry after failing.",
+        "# TYPE stryde_write_behind_deferred gauge",
+        f"stryde_write_behind_deferred {write_behind.deferred()}",
+        "# HELP stryde_write_behind_written_total Background DB writes that landed.",
+        "# TYPE stryde_write_behind_written_total counter",
+        f"stryde_write_behind_written_total {write_behind.written}",
+    ]
+    body = metrics.render_prometheus() + "\n".join(lines) + "\n"
+    return Response(body, mimetype='text/plain; version=0.0.4')
+
+@routes.route('/api/health', methods=['GET'])
 def health():
     """Health check endpoint"""
     return jsonify({'status': 'ok'})
 
+def preload():
+    """
+    Import the pipeline and predictor modules and build the race-time tables
+    now instead of on the first request. Under gunicorn's preload_app this
+    runs once in the master, so forked workers share those pages rather than
+    each paying for the imports. No DB client is created here: connections
+    must not be shared across fork.
+    """
+    import dataPrep, dbReaders
+    from getPredictions import lookup_tables
+    from vdot_ml_model import variableVdotPredictor_v2
+
+    lookup_tables()
+
+def create_app():
+    """
+    The Flask app with every route registered. Job queue, caches and limits
+    are module-level, so all apps in a process share them.
+    """
+    app = Flask(__name__)
+    CORS(app)
+    app.register_blueprint(routes)
+    return app
+
+app = create_app()
+
 if __name__ == '__main__':
-    app.run(debug=True, port=5000)
\ No newline at end of file
+    # Development server only; production runs wsgi:app under gunicorn (see gunicorn.conf.py)
+    app.run(debug=os.getenv('FLASK_DEBUG') == '1', port=int(os.getenv('PORT', 5000)), threaded=True)
\ No newline at end of file
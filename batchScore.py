@@ -0,0 +1,185 @@
+"""
+Nightly batch scoring of many athletes' Strava exports.
+
+Runs clean_strava_activities -> build_rolling_features -> label_rolling_features ->
+predict_vdot_v2 for every user across a process pool, writing one JSON line
+per user. A failure in one user's export is recorded and never stops the run.
+
+A worker process that dies (out of memory, segfault) breaks the whole pool:
+every user still pending fails with BrokenProcessPool, not just the one that
+crashed. Those users are resubmitted to a new pool. After --pool-restarts
+crashes, each user still left runs alone in its own process, so only the user
+that brings its process down is recorded as failed.
+
+    python batchScore.py --input exports/ --output scores.jsonl --workers 8
+    python batchScore.py --manifest manifest.csv --output scores.jsonl
+
+A directory is scanned for *.csv files, using the file name (without .csv)
+as the user id. A manifest is a CSV with `user` and `path` columns.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pandas as pd
+
+
+def load_jobs(input_dir=None, manifest=None):
+    if manifest:
+        base = os.path.dirname(os.path.abspath(manifest))
+        with open(manifest, newline='') as f:
+            return [(row['user'], os.path.join(base, row['path'])) for row in csv.DictReader(f)]
+
+    return [
+        (os.path.splitext(name)[0], os.path.join(input_dir, name))
+        for name in sorted(os.listdir(input_dir))
+        if name.endswith('.csv')
+    ]
+
+
+def score_user(user, path, months_ahead=1):
+    """Full pipeline for one export. Never raises: errors come back in the record."""
+    from vdot_ml_model.cleanInput import clean_strava_activities, INGEST_CHUNKSIZE
+    from vdot_ml_model.buildRollingFeatures import build_rolling_features
+    from vdot_ml_model.labelVdot import label_rolling_features
+    from vdot_ml_model.variableVdotPredictor_v2 import predict_vdot_v2
+
+    start = time.perf_counter()
+    record = {'user': user, 'path': path}
+    try:
+        runs = clean_strava_activities(path, chunksize=INGEST_CHUNKSIZE or None)
+        rolling = build_rolling_features(runs, engine="kernel")
+        vdot_data = label_rolling_features(runs, rolling)
+
+        record['runs'] = len(runs)
+        record['races'] = len(vdot_data)
+        record['avg_hr'] = int(round(runs['average_heartrate'].mean())) if len(runs) else None
+        record['recent_activity'] = (
+            json.loads(rolling.iloc[-1].to_json(date_format='iso')) if len(rolling) else None
+        )
+
+        if vdot_data.empty:
+            record['vdot'] = None
+            record['forecast'] = None
+        else:
+            record['vdot'] = round(float(vdot_data['vdot'].iloc[-1]), 2)
+            record['forecast'] = predict_vdot_v2(vdot_data, runs, months_ahead=months_ahead, verbose=False)
+
+        record['status'] = 'error' if record['forecast'] and 'error' in record['forecast'] else 'ok'
+    except Exception as e:
+        record['status'] = 'error'
+        record['error'] = f"{type(e).__name__}: {e}"
+        record['traceback'] = traceback.format_exc()
+
+    record['seconds'] = round(time.perf_counter() - start, 4)
+    return record
+
+
+def crash_record(user, path, error):
+    return {'user': user, 'path': path, 'status': 'error',
+            'error': f"{type(error).__name__}: {error}", 'seconds': 0.0}
+
+
+def score_in_pool(jobs, workers, months_ahead, emit):
+    """
+    Score `jobs` across a pool of `workers` processes, passing each record to
+    `emit`. Returns the jobs lost because a worker died and broke the pool.
+    """
+    lost = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(score_user, user, path, months_ahead): (user, path) for user, path in jobs}
+        for future in as_completed(futures):
+            user, path = futures[future]
+            try:
+                emit(future.result())
+            except BrokenProcessPool:
+                lost.append((user, path))
+            except Exception as e:
+                # Submitting or unpickling failed for this user only
+                emit(crash_record(user, path, e))
+    return lost
+
+
+def score_isolated(user, path, months_ahead):
+    """Score one user in a fresh single-worker pool, so a crash is attributed to them alone."""
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        try:
+            return pool.submit(score_user, user, path, months_ahead).result()
+        except Exception as e:
+            return crash_record(user, path, e)
+
+
+def summarize(records, wall_seconds):
+    seconds = np.array([r['seconds'] for r in records]) if records else np.array([0.0])
+    failed = sum(1 for r in records if r['status'] != 'ok')
+    return {
+        'users': len(records),
+        'ok': len(records) - failed,
+        'failed': failed,
+        'wall_seconds': round(wall_seconds, 2),
+        'users_per_sec': round(len(records) / wall_seconds, 2) if wall_seconds else None,
+        'p50_seconds': round(float(np.percentile(seconds, 50)), 4),
+        'p95_seconds': round(float(np.percentile(seconds, 95)), 4),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--input', help='directory of per-user Strava exports (<user>.csv)')
+    source.add_argument('--manifest', help='CSV manifest with user,path columns')
+    parser.add_argument('--output', default='-', help='JSON lines output file (default: stdout)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--months-ahead', type=int, default=1)
+    parser.add_argument('--progress-every', type=int, default=50, help='report progress every N users')
+    parser.add_argument('--pool-restarts', type=int, default=2,
+                        help='pools rebuilt after a worker dies before the remaining users run one per process')
+    args = parser.parse_args(argv)
+
+    jobs = load_jobs(input_dir=args.input, manifest=args.manifest)
+    if not jobs:
+        print("No exports found.", file=sys.stderr)
+        return 1
+
+    out = sys.stdout if args.output == '-' else open(args.output, 'w')
+    records = []
+    start = time.perf_counter()
+
+    def emit(record):
+        records.append(record)
+        out.write(json.dumps(record, default=str) + '\n')
+
+        done = len(records)
+        if done % args.progress_every == 0 or done == len(jobs):
+            elapsed = time.perf_counter() - start
+            failed = sum(1 for r in records if r['status'] != 'ok')
+            print(f"[{done}/{len(jobs)}] {done / elapsed:.1f} users/s, {failed} failed", file=sys.stderr)
+
+    try:
+        remaining = jobs
+        for restart in range(args.pool_restarts + 1):
+            remaining = score_in_pool(remaining, args.workers, args.months_ahead, emit)
+            if not remaining:
+                break
+            print(f"A worker died; {len(remaining)} unfinished users to rerun", file=sys.stderr)
+
+        for user, path in remaining:
+            emit(score_isolated(user, path, args.months_ahead))
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    summary = summarize(records, time.perf_counter() - start)
+    print(json.dumps(summary, indent=2), file=sys.stderr)
+    return 0 if summary['failed'] == 0 else 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
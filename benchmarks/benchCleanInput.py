@@ -0,0 +1,57 @@
+"""
+Compare peak memory and wall time of the buffered and streaming ingestion
+paths of clean_strava_csv on synthetic wide Strava exports.
+
+    python -m benchmarks.benchCleanInput --sizes 10000 100000
+"""
+import argparse
+import time
+import tracemalloc
+from io import BytesIO, StringIO
+
+import pandas as pd
+
+from vdot_ml_model.cleanInput import clean_strava_csv
+from benchmarks.syntheticData import strava_export_bytes
+
+
+def buffered(data):
+    csv_io = StringIO(BytesIO(data).read().decode('utf-8'))
+    return clean_strava_csv(input_csv_path=csv_io)
+
+
+def streaming(data, chunksize):
+    return clean_strava_csv(input_csv_path=BytesIO(data), chunksize=chunksize)
+
+
+def measure(fn, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 50_000])
+    parser.add_argument("--chunksize", type=int, default=5000)
+    args = parser.parse_args()
+
+    print(f"{'activities':>10} {'MB':>6} {'path':>10} {'seconds':>8} {'peak MB':>8}")
+    for size in args.sizes:
+        data = strava_export_bytes(size)
+        mb = len(data) / 1e6
+
+        full, t_full, peak_full = measure(buffered, data)
+        chunked, t_chunked, peak_chunked = measure(streaming, data, args.chunksize)
+        pd.testing.assert_frame_equal(full, chunked, check_dtype=False)
+
+        print(f"{size:>10} {mb:>6.1f} {'buffered':>10} {t_full:>8.3f} {peak_full / 1e6:>8.1f}")
+        print(f"{size:>10} {mb:>6.1f} {'streaming':>10} {t_chunked:>8.3f} {peak_chunked / 1e6:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
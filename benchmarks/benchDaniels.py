@@ -0,0 +1,72 @@
+"""
+Benchmark the vectorized Daniels formula against the table lookups.
+
+Reports evaluations per second for:
+- the forward formula (vdot_from_race);
+- the Newton inverse (race_time);
+- the table and formula engines of get_times_batch.
+Each runs over --n random VDOTs (--vdot-range, default 25-90) and distances.
+It also reports how far the formula engine's times are from the
+hand-typed table at each of the table's VDOTs.
+
+    python -m benchmarks.benchDaniels --n 1000000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from vdot_ml_model.danielsFormula import vdot_from_race, race_time
+from getPredictions import get_times_batch, lookup_tables, DISTANCES, DISTANCE_METRES
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=1_000_000, help="evaluations per timed call")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--vdot-range", type=float, nargs=2, default=[25.0, 90.0])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    vdots = rng.uniform(*args.vdot_range, size=args.n)
+    metres = np.array([DISTANCE_METRES[d] for d in DISTANCES])
+    distances = rng.choice(metres, size=args.n)
+    times = race_time(vdots, distances)
+
+    cases = [
+        ("vdot_from_race", args.n, lambda: vdot_from_race(distances, times)),
+        ("race_time", args.n, lambda: race_time(vdots, distances)),
+        # get_times_batch evaluates every distance for each VDOT
+        ("table engine", args.n * len(DISTANCES), lambda: get_times_batch(vdots, DISTANCES, engine="table")),
+        ("formula engine", args.n * len(DISTANCES), lambda: get_times_batch(vdots, DISTANCES, engine="formula")),
+    ]
+
+    print(f"{'case':>16} {'evals':>10} {'seconds':>8} {'M evals/s':>10}")
+    for name, evals, fn in cases:
+        seconds = best_of(fn, args.repeat)
+        print(f"{name:>16} {evals:>10} {seconds:>8.4f} {evals / seconds / 1e6:>10.2f}")
+
+    roundtrip = np.abs(vdot_from_race(distances, times) - vdots).max()
+    print(f"\nrace_time round trip: max |VDOT error| {roundtrip:.2e}")
+
+    vdot_table, time_table = lookup_tables()
+    formula = race_time(vdot_table[:, None], metres)
+    rel = np.abs(formula - time_table) / time_table
+    print(f"\n{'distance':>14} {'max rel diff':>13} {'at VDOT':>8}")
+    for i, d in enumerate(DISTANCES):
+        worst = rel[:, i].argmax()
+        print(f"{d:>14} {rel[worst, i]:>13.4%} {vdot_table[worst]:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Benchmark the RunData write path against the local stand-in client.
+
+Each request to the stand-in sleeps for --latency seconds to model a Supabase
+round trip, so batch_size=1 reproduces the old insert-per-row behaviour.
+A second table compares the RunData write modes on a typical re-upload
+(a few runs added, one removed, one edited).
+
+    python -m benchmarks.benchDbWrites --runs 2000 --latency 0.005
+"""
+import argparse
+import time
+
+import pandas as pd
+
+from dataPrep import write_rundata_to_db
+from localDb import LocalClient
+from benchmarks.syntheticData import make_clean_runs
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.005, help="seconds per simulated round trip")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 100, 500, 1000])
+    args = parser.parse_args()
+
+    df = make_clean_runs(args.runs)
+
+    print(f"{'batch_size':>10} {'requests':>9} {'written':>8} {'failed':>7} {'seconds':>8}")
+    for batch_size in args.batch_sizes:
+        client = LocalClient(latency=args.latency)
+        start = time.perf_counter()
+        summary = write_rundata_to_db(df, "bench-batch", batch_size=batch_size, supabase=client, mode="replace")
+        elapsed = time.perf_counter() - start
+        requests = sum(client.calls.values())
+        print(f"{batch_size:>10} {requests:>9} {summary['written']:>8} {summary['failed']:>7} {elapsed:>8.3f}")
+
+    added = make_clean_runs(5, seed=1, start=df["start_date"].iloc[-1])
+    reupload = pd.concat([df.drop(index=[0]), added], ignore_index=True)
+    reupload.loc[len(reupload) // 2, "distance"] += 1.0
+
+    print(f"\n{'mode':>10} {'requests':>9} {'written':>8} {'deleted':>8} {'seconds':>8}")
+    for mode in ("replace", "diff", "sync"):
+        client = LocalClient(latency=args.latency)
+        write_rundata_to_db(df, user=f"bench-{mode}", supabase=client, mode=mode)
+        client.calls.clear()
+
+        start = time.perf_counter()
+        summary = write_rundata_to_db(reupload, user=f"bench-{mode}", supabase=client, mode=mode)
+        elapsed = time.perf_counter() - start
+        requests = sum(client.calls.values())
+        deleted = summary.get("deleted", "all")
+        print(f"{mode:>10} {requests:>9} {summary['written']:>8} {deleted:>8} {elapsed:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Compare the loop and vectorized engines of label_rolling_features on
+synthetic run histories, checking that both produce the same frame.
+
+    python -m benchmarks.benchLabelVdot --sizes 10000 50000 100000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from vdot_ml_model.buildRollingFeatures import build_rolling_features
+from vdot_ml_model.labelVdot import label_rolling_features
+from benchmarks.syntheticData import make_clean_runs
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 50_000, 100_000])
+    parser.add_argument("--skip-loop-above", type=int, default=100_000,
+                        help="skip the O(races x rows) loop engine for larger histories")
+    args = parser.parse_args()
+
+    output_csv = os.path.join(tempfile.mkdtemp(), "vdot_ml_dataset.csv")
+
+    print(f"{'runs':>8} {'labeled':>8} {'loop s':>8} {'vector s':>9} {'speedup':>8}")
+    for size in args.sizes:
+        runs = make_clean_runs(size)
+        runs["start_date"] = pd.to_datetime(runs["start_date"])
+        rolling = build_rolling_features(runs)
+
+        fast, t_fast = timed(label_rolling_features, runs, rolling, output_csv, engine="vectorized")
+
+        if size <= args.skip_loop_above:
+            slow, t_slow = timed(label_rolling_features, runs, rolling, output_csv, engine="loop")
+            pd.testing.assert_frame_equal(slow, fast, check_exact=True)
+            print(f"{size:>8} {len(fast):>8} {t_slow:>8.3f} {t_fast:>9.4f} {t_slow / t_fast:>7.0f}x")
+        else:
+            print(f"{size:>8} {len(fast):>8} {'-':>8} {t_fast:>9.4f} {'-':>8}")
+
+
+if __name__ == "__main__":
+    main()
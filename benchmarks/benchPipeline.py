@@ -0,0 +1,162 @@
+"""
+End-to-end benchmark of the model pipeline on synthetic Strava exports, for
+tracking time and memory regressions between commits.
+
+Stages: clean_strava_csv and clean_strava_activities (ActivityStore),
+build_rolling_features (pandas and kernel engines), label_rolling_features,
+get_times (per VDOT, batched, and batched with the Daniels formula engine),
+predict_vdot and predict_vdot_v2. Wall time is the best of --repeat runs; peak memory comes
+from one extra run under tracemalloc.
+
+    python -m benchmarks.benchPipeline --sizes 1000 10000 100000 --json before.json
+    python -m benchmarks.benchPipeline --sizes 1000 10000 100000 --compare before.json
+
+With --compare the exit code is 1 when any stage got slower or bigger by
+more than --threshold (stages faster than --min-seconds are not timed for
+regressions, they are too noisy).
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from io import BytesIO
+
+import pandas as pd
+
+from vdot_ml_model.cleanInput import clean_strava_csv, clean_strava_activities, INGEST_CHUNKSIZE
+from vdot_ml_model.buildRollingFeatures import build_rolling_features
+from vdot_ml_model.labelVdot import label_rolling_features
+from vdot_ml_model.variableVdotPredictor import predict_vdot
+from vdot_ml_model.variableVdotPredictor_v2 import predict_vdot_v2
+from getPredictions import get_times, get_times_batch
+from benchmarks.syntheticData import strava_export_bytes
+
+
+def measure(fn, repeat=3, memory=True):
+    """Best-of-`repeat` wall time and (optionally) tracemalloc peak of `fn()`."""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+
+    peak = None
+    if memory:
+        tracemalloc.start()
+        try:
+            fn()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result, best, peak
+
+
+def bench_size(activities, seed=0, repeat=3, memory=True, chunksize=INGEST_CHUNKSIZE, predictors=True):
+    data = strava_export_bytes(activities, seed=seed)
+    rows = []
+
+    def record(stage, fn):
+        result, seconds, peak = measure(fn, repeat=repeat, memory=memory)
+        rows.append({"activities": activities, "stage": stage, "seconds": seconds, "peak_bytes": peak})
+        return result
+
+    runs = record("clean", lambda: clean_strava_csv(BytesIO(data), chunksize=chunksize or None))
+    runs["start_date"] = pd.to_datetime(runs["start_date"])
+    record("clean_store", lambda: clean_strava_activities(BytesIO(data), chunksize=chunksize or None))
+
+    rolling = record("rolling_pandas", lambda: build_rolling_features(runs))
+    record("rolling_kernel", lambda: build_rolling_features(runs, engine="kernel"))
+    vdot_data = record("label", lambda: label_rolling_features(runs, rolling))
+
+    vdots = vdot_data["vdot"].to_numpy()
+    record("get_times", lambda: [get_times(v) for v in vdots])
+    record("get_times_batch", lambda: get_times_batch(vdots))
+    record("get_times_formula", lambda: get_times_batch(vdots, engine="formula"))
+
+    if predictors and not vdot_data.empty:
+        record("predict_vdot", lambda: predict_vdot(vdot_data, runs, verbose=False))
+        record("predict_vdot_v2", lambda: predict_vdot_v2(vdot_data, runs, verbose=False, cache=None))
+
+    return rows, {"activities": activities, "runs": len(runs), "races": len(vdot_data)}
+
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold, min_seconds):
+    """Rows of (activities, stage, metric, old, new) that regressed past `threshold`."""
+    old = {(r["activities"], r["stage"]): r for r in baseline["results"]}
+    regressions = []
+    for r in results:
+        before = old.get((r["activities"], r["stage"]))
+        if before is None:
+            continue
+        if before["seconds"] >= min_seconds and r["seconds"] > before["seconds"] * (1 + threshold):
+            regressions.append((r["activities"], r["stage"], "seconds", before["seconds"], r["seconds"]))
+        if before.get("peak_bytes") and r["peak_bytes"] and r["peak_bytes"] > before["peak_bytes"] * (1 + threshold):
+            regressions.append((r["activities"], r["stage"], "peak_bytes", before["peak_bytes"], r["peak_bytes"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000],
+                        help="activities per synthetic export (about 70%% are runs)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc run")
+    parser.add_argument("--predictor-max-activities", type=int, default=100_000,
+                        help="skip both predictors above this size")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="baseline JSON from an earlier --json run")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown/growth (0.25 = 25%%)")
+    parser.add_argument("--min-seconds", type=float, default=0.01)
+    args = parser.parse_args()
+
+    results, datasets = [], []
+    print(f"{'activities':>10} {'stage':>17} {'seconds':>9} {'peak MB':>8}")
+    for size in args.sizes:
+        rows, dataset = bench_size(size, seed=args.seed, repeat=args.repeat, memory=not args.no_memory,
+                                   predictors=size <= args.predictor_max_activities)
+        datasets.append(dataset)
+        for r in rows:
+            peak = f"{r['peak_bytes'] / 1e6:>8.1f}" if r["peak_bytes"] is not None else f"{'-':>8}"
+            print(f"{size:>10} {r['stage']:>17} {r['seconds']:>9.4f} {peak}")
+        results.extend(rows)
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "datasets": datasets,
+        "results": results,
+    }
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold, args.min_seconds)
+        print(f"\nCompared with {args.compare} (commit {baseline.get('commit')}):")
+        for activities, stage, metric, before, after in regressions:
+            print(f"  REGRESSION {activities:>8} {stage:>17} {metric}: {before:.4g} -> {after:.4g} ({after / before:.2f}x)")
+        if regressions:
+            return 1
+        print("  no regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
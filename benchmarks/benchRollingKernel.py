@@ -0,0 +1,45 @@
+"""
+Compare the pandas and single-pass kernel engines of build_rolling_features
+as history length and the number of windows grow.
+
+    python -m benchmarks.benchRollingKernel --sizes 1000 10000 100000
+"""
+import argparse
+import time
+
+import pandas as pd
+
+from vdot_ml_model.buildRollingFeatures import build_rolling_features
+from benchmarks.syntheticData import make_clean_runs
+
+WINDOW_SETS = [
+    (14, 30),
+    (7, 14, 30, 60),
+    (3, 7, 14, 30, 60, 90, 180, 365),
+]
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    args = parser.parse_args()
+
+    print(f"{'runs':>8} {'windows':>7} {'pandas s':>9} {'kernel s':>9} {'speedup':>8}")
+    for size in args.sizes:
+        runs = make_clean_runs(size)
+        runs["start_date"] = pd.to_datetime(runs["start_date"])
+        for windows in WINDOW_SETS:
+            slow, t_slow = timed(build_rolling_features, runs, windows=windows, engine="pandas")
+            fast, t_fast = timed(build_rolling_features, runs, windows=windows, engine="kernel")
+            pd.testing.assert_frame_equal(slow, fast, rtol=1e-9)
+            print(f"{size:>8} {len(windows):>7} {t_slow:>9.4f} {t_fast:>9.4f} {t_slow / t_fast:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Cold-start import benchmark for the Flask service.
+
+Runs `python -X importtime -c "import app"` in fresh interpreters, reports the
+median wall time and the modules with the largest cumulative import cost,
+and exits non-zero when --max-ms is given and exceeded (for CI).
+
+    python -m benchmarks.benchStartup --runs 5 --top 15
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_once(module):
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    elapsed = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr)
+
+    cumulative = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        cumulative[name.strip()] = int(cumulative_us)
+    return elapsed, cumulative
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--module", default="app")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--max-ms", type=float, default=None, help="fail if the median import exceeds this")
+    args = parser.parse_args()
+
+    walls = []
+    profile = {}
+    for _ in range(args.runs):
+        elapsed, profile = import_once(args.module)
+        walls.append(elapsed * 1000)
+
+    median = statistics.median(walls)
+    print(f"import {args.module}: median {median:.0f} ms over {args.runs} runs (min {min(walls):.0f} ms)")
+    print(f"\n{'cumulative ms':>13}  module")
+    for name, us in sorted(profile.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{us / 1000:>13.1f}  {name}")
+
+    heavy = [m for m in ("pandas", "matplotlib", "statsmodels", "sklearn", "scipy", "supabase") if m in profile]
+    print(f"\nheavy modules imported at startup: {', '.join(heavy) or 'none'}")
+
+    if args.max_ms is not None and median > args.max_ms:
+        sys.exit(f"startup {median:.0f} ms exceeds budget of {args.max_ms:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
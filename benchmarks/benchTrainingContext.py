@@ -0,0 +1,61 @@
+"""
+Scaling of the 30-day pre-race training context used by both VDOT
+predictors: the old per-observation boolean mask versus the shared
+searchsorted/prefix-sum builder.
+
+    python -m benchmarks.benchTrainingContext --sizes 100 1000 10000 100000
+"""
+import argparse
+import time
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from vdot_ml_model.trainingContext import training_context
+from benchmarks.syntheticData import make_clean_runs
+
+
+def masked_context(runs, dates, window_days=30):
+    """The per-observation loop the predictors used to run."""
+    rows = []
+    for date in dates:
+        window_start = date - timedelta(days=window_days)
+        window_runs = runs[(runs['start_date'] >= window_start) & (runs['start_date'] < date)]
+        if len(window_runs) == 0:
+            rows.append([np.nan] * 4)
+            continue
+        rows.append([
+            window_runs['distance_km'].sum(),
+            len(window_runs),
+            window_runs['average_speed'].mean(),
+            window_runs['average_heartrate'].mean(),
+        ])
+    return np.array(rows, dtype=float)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1_000, 10_000, 100_000])
+    args = parser.parse_args()
+
+    print(f"{'runs':>8} {'races':>6} {'masked s':>9} {'prefix s':>9} {'speedup':>8}")
+    for size in args.sizes:
+        runs = make_clean_runs(size)
+        runs['start_date'] = pd.to_datetime(runs['start_date'])
+        races = runs.loc[runs['average_heartrate'] >= 165, 'start_date']
+
+        start = time.perf_counter()
+        slow = masked_context(runs, races)
+        t_slow = time.perf_counter() - start
+
+        start = time.perf_counter()
+        fast, _ = training_context(runs, races)
+        t_fast = time.perf_counter() - start
+
+        np.testing.assert_allclose(slow, fast, rtol=1e-9)
+        print(f"{size:>8} {len(races):>6} {t_slow:>9.4f} {t_fast:>9.5f} {t_slow / t_fast:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Concurrent upload load test.
+
+Serves the app in-process on a threaded WSGI server backed by the local
+stand-in DB (DB_BACKEND=local, --latency seconds per request). Alternatively,
+--url points it at a running server, e.g. gunicorn started with
+DB_BACKEND=local and STRYDE_TRUST_USER_HEADER=1.
+
+--concurrency client threads post --requests synthetic exports, spread over
+--users distinct athletes (X-User-Id). Reported:
+- throughput of successful uploads;
+- latency percentiles including p99, plus time to the first prediction event
+  for --endpoint stream;
+- status codes, so 429/503 rejections from the concurrency limits show up.
+
+    python -m benchmarks.loadTest --users 16 --concurrency 8 --requests 64
+    python -m benchmarks.loadTest --url http://localhost:5000 --endpoint stream
+"""
+import argparse
+import os
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+import numpy as np
+
+from benchmarks.syntheticData import strava_export_bytes
+
+BOUNDARY = "stryde-load-test"
+
+
+def multipart_body(data, filename="export.csv"):
+    head = (
+        f"--{BOUNDARY}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        "Content-Type: text/csv\r\n\r\n"
+    ).encode()
+    return head + data + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+def upload(base_url, endpoint, user, body):
+    """(status, seconds to the full response, seconds to the prediction event or None)."""
+    path = "/api/upload-data/stream" if endpoint == "stream" else "/api/upload-data"
+    req = Request(base_url + path, data=body, method="POST", headers={
+        "Content-Type": f"multipart/form-data; boundary={BOUNDARY}",
+        "X-User-Id": user,
+    })
+    start = time.perf_counter()
+    first_prediction = None
+    try:
+        with urlopen(req, timeout=600) as resp:
+            status = resp.status
+            if endpoint == "stream":
+                for line in resp:
+                    if first_prediction is None and line.startswith(b"event: prediction"):
+                        first_prediction = time.perf_counter() - start
+                    if line.startswith(b"event: error"):
+                        status = 500
+            else:
+                resp.read()
+    except HTTPError as e:
+        status = e.code
+    return status, time.perf_counter() - start, first_prediction
+
+
+def serve_in_process(latency):
+    """Start the app on a free local port; returns (base URL, server)."""
+    os.environ.setdefault("DB_BACKEND", "local")
+    # Each simulated athlete is identified by its X-User-Id
+    os.environ.setdefault("STRYDE_TRUST_USER_HEADER", "1")
+    from werkzeug.serving import make_server
+    import dbClient
+    from app import create_app
+
+    dbClient.get_client().latency = latency
+    server = make_server("127.0.0.1", 0, create_app(), threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", server
+
+
+def percentiles(values, qs=(50, 90, 99)):
+    if not values:
+        return {q: float("nan") for q in qs}
+    return dict(zip(qs, np.percentile(values, qs)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="base URL of a running server (default: serve in-process)")
+    parser.add_argument("--endpoint", choices=["upload", "stream"], default="upload")
+    parser.add_argument("--users", type=int, default=16)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--activities", type=int, default=2000, help="activities per synthetic export")
+    parser.add_argument("--latency", type=float, default=0.005, help="seconds per stand-in DB request (in-process only)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.url
+    if base_url is None:
+        base_url, server = serve_in_process(args.latency)
+
+    # A distinct export per request, so every upload runs the pipeline (no cache
+    # hits) and a user's repeated uploads queue behind each other
+    users = [str(uuid.uuid5(uuid.NAMESPACE_URL, f"stryde-load-{i}")) for i in range(args.users)]
+    jobs = [(users[i % args.users], multipart_body(strava_export_bytes(args.activities, seed=args.seed + i)))
+            for i in range(args.requests)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(lambda job: upload(base_url, args.endpoint, *job), jobs))
+    wall = time.perf_counter() - start
+
+    statuses = Counter(status for status, _, _ in results)
+    ok = [seconds for status, seconds, _ in results if status == 200]
+    first = [p for status, _, p in results if status == 200 and p is not None]
+
+    print(f"{args.requests} uploads of {args.activities} activities, {args.users} users, "
+          f"{args.concurrency} concurrent, endpoint {args.endpoint}")
+    print(f"  status codes: {dict(sorted(statuses.items()))}")
+    print(f"  throughput:   {len(ok) / wall:.2f} uploads/s ({wall:.2f} s wall)")
+    latency = percentiles(ok)
+    print(f"  latency:      p50 {latency[50]:.3f} s  p90 {latency[90]:.3f} s  p99 {latency[99]:.3f} s  "
+          f"max {max(ok, default=float('nan')):.3f} s")
+    if first:
+        prediction = percentiles(first)
+        print(f"  prediction:   p50 {prediction[50]:.3f} s  p90 {prediction[90]:.3f} s  p99 {prediction[99]:.3f} s")
+
+    if server is not None:
+        from dataPrep import write_behind
+
+        flush_start = time.perf_counter()
+        write_behind.flush()
+        print(f"  write-behind drained {time.perf_counter() - flush_start:.2f} s after the last response")
+        server.shutdown()
+    return 0 if statuses.get(200, 0) == args.requests else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
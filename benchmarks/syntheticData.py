@@ -0,0 +1,120 @@
+"""
+Synthetic Strava data for the benchmarks.
+
+make_clean_runs builds frames shaped like clean_strava_csv output;
+make_strava_export builds raw exports in the real Strava layout and date
+format. Exports can also be written to disk for manual testing:
+
+    python -m benchmarks.syntheticData --rows 100000 --output export.csv
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+
+def make_clean_runs(n_runs: int, seed: int = 0, start="1900-01-01") -> pd.DataFrame:
+    """
+    Build a synthetic frame shaped like the output of clean_strava_csv.
+
+    Runs are spaced roughly a day apart with some doubles and rest days; about
+    one in ten is a hard, race-like effort so labelVdot has something to find.
+    Histories too long to fit before pandas' last representable timestamp
+    (about 100k runs) have their spacing compressed to fit.
+    """
+    rng = np.random.default_rng(seed)
+
+    gaps_hours = rng.choice([6, 24, 24, 24, 48], size=n_runs) + rng.uniform(-2, 2, size=n_runs)
+    offsets = np.cumsum(gaps_hours)
+    budget_ns = min(pd.Timestamp.max.value - pd.Timestamp(start).value, pd.Timedelta.max.value)
+    budget_hours = budget_ns / pd.Timedelta(hours=1).value - 24
+    if n_runs and offsets[-1] > budget_hours:
+        offsets *= budget_hours / offsets[-1]
+    start_date = pd.Timestamp(start) + pd.to_timedelta(offsets, unit="h")
+    start_date = start_date.floor("s")
+
+    race = rng.random(n_runs) < 0.1
+    distance_km = np.where(race, rng.choice([5.0, 10.0, 21.1], size=n_runs), rng.uniform(3.0, 18.0, size=n_runs))
+    pace_sec_per_km = np.where(race, rng.uniform(220, 300, size=n_runs), rng.uniform(280, 380, size=n_runs))
+    moving_time = distance_km * pace_sec_per_km
+    elapsed_time = np.where(race, moving_time * 1.01, moving_time * rng.uniform(1.0, 1.15, size=n_runs))
+    average_heartrate = np.where(race, rng.uniform(165, 185, size=n_runs), rng.uniform(130, 158, size=n_runs))
+
+    df = pd.DataFrame({
+        "distance": distance_km.round(2),
+        "moving_time": moving_time.round(0),
+        "elapsed_time": elapsed_time.round(0),
+        "average_speed": (distance_km * 1000 / moving_time).round(3),
+        "average_heartrate": average_heartrate.round(1),
+        "max_heartrate": (average_heartrate + rng.uniform(5, 15, size=n_runs)).round(0),
+        # Climb scales with distance on a per-run hilliness (m/km)
+        "total_elevation_gain": (distance_km * rng.gamma(2.0, 6.0, size=n_runs)).round(1),
+        "type": "Run",
+        "start_date": start_date.strftime('%Y-%m-%d %H:%M:%S'),
+    })
+    df["distance_km"] = df["distance"].copy()
+    df["distance_miles"] = df["distance_km"] * 0.621371
+    return df
+
+
+STRAVA_COLUMNS = {
+    "distance": "Distance",
+    "moving_time": "Moving Time",
+    "elapsed_time": "Elapsed Time",
+    "average_speed": "Average Speed",
+    "average_heartrate": "Average Heart Rate",
+    "max_heartrate": "Max Heart Rate",
+    "total_elevation_gain": "Elevation Gain",
+    "type": "Activity Type",
+    "start_date": "Activity Date",
+}
+
+
+def make_strava_export(n_activities: int, seed: int = 0, other_share=0.3, filler_columns=60) -> pd.DataFrame:
+    """
+    Build a synthetic raw Strava export in the layout clean_strava_csv reads.
+
+    `other_share` of the activities are rides/walks, and `filler_columns`
+    unused columns pad each row out to the width of a real export. Like the
+    real thing, "Distance" and "Elapsed Time" appear twice.
+    """
+    rng = np.random.default_rng(seed)
+    runs = make_clean_runs(n_activities, seed=seed)
+
+    raw = runs[list(STRAVA_COLUMNS)].rename(columns=STRAVA_COLUMNS)
+    raw["Activity Type"] = np.where(rng.random(n_activities) < other_share, rng.choice(["Ride", "Walk"], size=n_activities), "Run")
+    raw["Activity Date"] = pd.to_datetime(raw["Activity Date"]).dt.strftime("%b %d, %Y, %I:%M:%S %p")
+
+    raw.insert(0, "Activity ID", np.arange(10_000_000, 10_000_000 + n_activities))
+    raw.insert(1, "Activity Name", "Morning Run")
+    raw.insert(2, "Activity Description", "Easy miles with some strides at the end")
+
+    filler = pd.DataFrame(
+        rng.uniform(0, 1000, size=(n_activities, filler_columns)).round(2),
+        columns=[f"Metric {i}" for i in range(filler_columns)],
+    )
+    duplicates = pd.DataFrame({
+        "Elapsed Time": raw["Elapsed Time"].to_numpy(),
+        "Distance": (raw["Distance"] * 1000).to_numpy(),
+    })
+    return pd.concat([raw, filler, duplicates], axis=1)
+
+
+def strava_export_bytes(n_activities: int, seed: int = 0, **kwargs) -> bytes:
+    return make_strava_export(n_activities, seed=seed, **kwargs).to_csv(index=False).encode("utf-8")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic Strava export CSV.")
+    parser.add_argument("--rows", type=int, default=10_000, help="activities, including non-runs")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--other-share", type=float, default=0.3, help="share of rides/walks")
+    parser.add_argument("--output", required=True)
+    args = parser.parse_args()
+
+    make_strava_export(args.rows, seed=args.seed, other_share=args.other_share).to_csv(args.output, index=False)
+    print(f"Wrote {args.rows} activities to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,2 @@
+# Puts the repository root on sys.path so tests import the top-level modules
+# (dataPrep, localDb, ...) the same way app.py does.
@@ -1,133 +1,353 @@
-import matplotlib
-matplotlib.use('Agg')
-
-from vdot_ml_model.cleanInput import clean_strava_csv
-from vdot_ml_model.buildRollingFeatures import build_rolling_features
+from vdot_ml_model.cleanInput import clean_strava_activities, INGEST_CHUNKSIZE
+from vdot_ml_model.activityStore import ActivityStore
+from vdot_ml_model.incrementalRollingFeatures import update_user_rolling_features
 from vdot_ml_model.labelVdot import label_rolling_features
-from vdot_ml_model.variableVdotPredictor import predict_vdot
-from vdot_ml_model.variableVdotPredictor_v2 import predict_vdot_v2
+from vdot_ml_model.frameIO import artifact_path, ARTIFACT_DIR
 
 import pandas as pd
-import matplotlib.pyplot as plt
+import numpy as np
 from io import StringIO
-from supabase import create_client, Client
+from collections import OrderedDict
+from contextlib import contextmanager
+import logging
 import os
+import threading
+import uuid
 
-def clean_and_build_dataset(file_stream):
-    try: 
-        csv_string = file_stream.read().decode('utf-8')
-        csv_io = StringIO(csv_string)
+from dbClient import get_client, execute
+from pipelineMetrics import metrics, sampled_log
+from writeBehind import WriteBehindWriter, DB_WRITE_BEHIND, register_shutdown
 
-        clean_data = clean_strava_csv(input_csv_path=csv_io)
-        write_rundata_to_db(clean_data)
-        clean_data["start_date"] = pd.to_datetime(clean_data["start_date"])
+logger = logging.getLogger("stryde.pipeline")
 
-        rolling_features_data = build_rolling_features(df=clean_data)
-        last_30_days = rolling_features_data.iloc[-1].copy() # last 30 days of activity
+def clean_upload(file_stream, chunksize=INGEST_CHUNKSIZE, output_path=None):
+    if chunksize:
+        # Stream straight from the upload instead of buffering the whole export
+        return clean_strava_activities(input_csv_path=file_stream, chunksize=chunksize, output_path=output_path)
 
-        vdot_data = label_rolling_features(runs_df=clean_data, rolling_df=rolling_features_data, output_csv="vdot_ml_model/vdot_ml_dataset.csv")
+    csv_string = file_stream.read().decode('utf-8')
+    csv_io = StringIO(csv_string)
+    return clean_strava_activities(input_csv_path=csv_io, output_path=output_path)
 
-        last_30_days_for_db = last_30_days.copy()
-        last_30_days_for_db["start_date"] = pd.Timestamp(last_30_days_for_db["start_date"]).strftime('%Y-%m-%d %H:%M:%S')
-        write_recent_activity_to_db(pd.DataFrame([last_30_days_for_db]))
+def build_forecast_inputs(file_stream, user, chunksize=INGEST_CHUNKSIZE):
+    """Clean runs and labeled VDOT observations for `user`'s upload, without touching the database."""
+    clean_data = clean_upload(file_stream, chunksize=chunksize)
 
-        if vdot_data.empty:
-            print("Warning: No race-like efforts found in data")
-            return 0.0, int(round(clean_data["average_heartrate"].mean()))
+    rolling_features_data = update_user_rolling_features(user, clean_data)
+    vdot_data = label_rolling_features(runs_df=clean_data, rolling_df=rolling_features_data)
+    return clean_data, vdot_data
+
+@contextmanager
+def _stage(name, job_id, progress, rows_in=None, user=None):
+    """A metrics.stage that also reports its completion to `progress`."""
+    with metrics.stage(name, rows_in=rows_in, job_id=job_id, user=user) as stage:
+        yield stage
+    if progress is not None:
+        progress("stage", stage=name, rows_in=stage.rows_in, rows_out=stage.rows_out, seconds=round(stage.seconds, 4))
+
+def clean_and_build_dataset(file_stream, user, chunksize=INGEST_CHUNKSIZE, artifact_dir=ARTIFACT_DIR, job_id=None,
+                            write_mode=None, progress=None, background=None):
+    """
+    Run the upload pipeline for `user` in memory. Callers hold the user's
+    pipelineLimits slot, so no two runs share a user's cached state. Stage outputs are only written to disk
+    when `artifact_dir` is set, under a per-user, per-job directory.
+    `write_mode` overrides RUNDATA_WRITE_MODE ("sync", "diff" or "replace").
+
+    The prediction only needs the cleaned runs, so the DB writes come last.
+    With `background` (default DB_WRITE_BEHIND) they are handed to
+    `write_behind` and reported as queued instead of waited for.
+    `progress(event, **data)`, if given, is called with "stage" after each
+    stage and with "prediction" (vdot, avg_hr) as soon as those are known.
+    """
+    try: 
+        job_id = job_id or uuid.uuid4().hex
+        clean_path = artifact_path("clean_activities", user, job_id, root=artifact_dir)
+        vdot_path = artifact_path("vdot_ml_dataset", user, job_id, root=artifact_dir)
+
+        with _stage("clean", job_id, progress, user=user) as stage:
+            clean_data = clean_upload(file_stream, chunksize=chunksize, output_path=clean_path)
+            stage.rows_out = len(clean_data)
+
+        # Re-uploads only extend the cached window state with the newly added runs
+        with _stage("rolling", job_id, progress, rows_in=len(clean_data), user=user) as stage:
+            rolling_features_data = update_user_rolling_features(user, clean_data)
+            stage.rows_out = len(rolling_features_data)
+
+        with _stage("label", job_id, progress, rows_in=len(rolling_features_data), user=user) as stage:
+            vdot_data = label_rolling_features(runs_df=clean_data, rolling_df=rolling_features_data, output_csv=vdot_path)
+            stage.rows_out = len(vdot_data)
 
-        latest_vdot = vdot_data.sort_values("start_date").iloc[-1]
-        
-        vdot_value = float(latest_vdot['vdot']) 
         avg_hr = int(round(clean_data["average_heartrate"].mean()))
+        if vdot_data.empty:
+            logger.warning("No race-like efforts found in data (job %s, user %s)", job_id, user)
+            vdot_value = 0.0
+        else:
+            latest_vdot = vdot_data.sort_values("start_date").iloc[-1]
+            vdot_value = float(latest_vdot['vdot']) 
+            logger.info("Job %s (user %s): VDOT %.2f, avg HR %d", job_id, user, vdot_value, avg_hr)
+        if progress is not None:
+            progress("prediction", vdot=vdot_value, avg_hr=avg_hr)
+
+        write_mode = write_mode or RUNDATA_WRITE_MODE
+        recent_activity = recent_activity_frame(rolling_features_data)
+
+        if DB_WRITE_BEHIND if background is None else background:
+            with _stage("persist_enqueue", job_id, progress, rows_in=len(clean_data) + 1, user=user) as stage:
+                write_summary = {
+                    "RunData": write_behind.submit("RunData", user, clean_data, mode=write_mode),
+                    "RecentActivity": write_behind.submit("RecentActivity", user, recent_activity),
+                }
+                stage.rows_out = sum(s.get("rows", s["written"]) for s in write_summary.values())
+            return vdot_value, avg_hr, write_summary
+
+        with _stage("rundata_write", job_id, progress, rows_in=len(clean_data), user=user) as stage:
+            rundata_summary = write_rundata_to_db(clean_data, user, mode=write_mode)
+            stage.rows_out = rundata_summary["written"]
+
+        with _stage("recent_activity_write", job_id, progress, rows_in=1, user=user) as stage:
+            recent_summary = write_recent_activity_to_db(recent_activity, user)
+            stage.rows_out = recent_summary["written"]
+        write_summary = {"RunData": rundata_summary, "RecentActivity": recent_summary}
+
+        return vdot_value, avg_hr, write_summary
         
-        print(f"VDOT (type: {type(vdot_value).__name__}): {vdot_value}")
-        print(f"Avg HR (type: {type(avg_hr).__name__}): {avg_hr}")
-        
-        return vdot_value, avg_hr
-        
-    except Exception as e:
-        print(f"Error in clean_and_build_dataset: {str(e)}")
-        import traceback
-        print(traceback.format_exc())
+    except Exception:
+        logger.exception("Error in clean_and_build_dataset")
         raise
 
-def write_rundata_to_db(df: pd.DataFrame):
-
-    user = 'cb6541ac-4f5f-48ce-9f59-87260d595a27'
-
-    SUPABASE_URL = os.getenv('DB_URL')
-    SUPABASE_KEY = os.getenv('DB_KEY')
-
-    supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-
-    # Delete current user's data
-    supabase.table("RunData").delete().eq("user", user).execute()
-    print("Existing user data deleted.")
-
-    data = df.to_dict(orient='records')
-    print(data)
-
-    count = 0
-    for record in data:
-        data_to_insert = {
-            "distance": float(record['distance']),
-            "moving_time": float(record['moving_time']),
-            "elapsed_time": float(record['elapsed_time']),
-            "average_speed": float(record['average_speed']),
-            "average_heartrate": float(record['average_heartrate']),
-            "max_heartrate": float(record['max_heartrate']),
-            "total_elevation_gain": float(record['total_elevation_gain']),
-            "type": record['type'],
-            "start_date": record['start_date'],
-            "distance_km": float(record['distance_km']),
-            "distance_miles": float(record['distance_miles']),
-            "user": user
-        }
-    
+def recent_activity_frame(rolling_features_data: pd.DataFrame) -> pd.DataFrame:
+    """The last rolling-feature row (last 30 days of activity) as a one-row frame for RecentActivity."""
+    last_30_days = rolling_features_data.iloc[-1].copy()
+    last_30_days["start_date"] = pd.Timestamp(last_30_days["start_date"]).strftime('%Y-%m-%d %H:%M:%S')
+    return pd.DataFrame([last_30_days])
+
+def summarize_stored_runs(runs, user):
+    """
+    VDOT and average HR for runs read back from the database (an
+    ActivityStore), plus their rolling features. Same stages as an upload,
+    without the writes; the user's cached rolling state makes a repeat cheap.
+    """
+    rolling_features_data = update_user_rolling_features(user, runs)
+    vdot_data = label_rolling_features(runs_df=runs, rolling_df=rolling_features_data)
+
+    avg_hr = int(round(runs["average_heartrate"].mean()))
+    vdot_value = float(vdot_data.sort_values("start_date").iloc[-1]["vdot"]) if not vdot_data.empty else 0.0
+    return vdot_value, avg_hr, rolling_features_data
+
+# Rows per upsert request. Supabase/PostgREST handles a few hundred rows per
+# request comfortably; override with DB_BATCH_SIZE for very wide tables.
+DEFAULT_BATCH_SIZE = int(os.getenv('DB_BATCH_SIZE', 500))
+
+# How an upload's runs reach RunData:
+#   "sync"     read the user's stored (start_date, distance) keys, insert only
+#              new runs and delete only runs missing from the export (default)
+#   "diff"     like sync, but against the last RunData this process wrote for
+#              the user (no read); falls back to "replace" without a snapshot
+#              (first upload, restart, or a failed write)
+#   "replace"  delete all of the user's rows and rewrite every run
+RUNDATA_WRITE_MODE = os.getenv('RUNDATA_WRITE_MODE', 'sync')
+RUNDATA_SNAPSHOT_MAX_USERS = int(os.getenv('RUNDATA_SNAPSHOT_MAX_USERS', 256))
+
+# user -> hash of each RunData row last written, indexed by start_date
+_rundata_snapshots = OrderedDict()
+_snapshot_lock = threading.Lock()
+
+RUNDATA_FLOAT_COLUMNS = [
+    "distance", "moving_time", "elapsed_time", "average_speed", "average_heartrate",
+    "max_heartrate", "total_elevation_gain", "distance_km", "distance_miles",
+]
+
+RECENT_ACTIVITY_FLOAT_COLUMNS = [
+    "mileage_km_30d", "mileage_miles_30d", "run_count_30d", "longest_run_km_30d",
+    "longest_run_miles_30d", "avg_pace_sec_per_km_30d", "fastest_pace_sec_per_km_30d",
+    "avg_pace_sec_per_mile_30d", "fastest_pace_sec_per_mile_30d", "avg_hr_30d",
+    "max_hr_30d", "elevation_gain_m_30d",
+]
+
+def _to_record_frame(df: pd.DataFrame, float_columns, text_columns, user) -> pd.DataFrame:
+    """
+    Insert payloads for a whole frame (or ActivityStore) at once instead of
+    row by row. Datetime columns are sent as 'YYYY-MM-DD HH:MM:SS' text and
+    blank metrics (NaN/inf) as None, since the JSON encoder rejects NaN and
+    would fail the whole chunk.
+    """
+    if isinstance(df, ActivityStore):
+        df = df.to_frame(float_columns + text_columns, wide=True)
+    out = df[text_columns].copy()
+    for col in text_columns:
+        if pd.api.types.is_datetime64_any_dtype(out[col]):
+            out[col] = out[col].dt.strftime('%Y-%m-%d %H:%M:%S')
+    values = df[float_columns].astype(float)
+    out[float_columns] = values.astype(object).where(np.isfinite(values), None)
+    out["user"] = user
+    return out[float_columns + text_columns + ["user"]]
+
+def _to_records(df: pd.DataFrame, float_columns, text_columns, user):
+    return _to_record_frame(df, float_columns, text_columns, user).to_dict(orient='records')
+
+def _row_hashes(frame: pd.DataFrame) -> pd.Series:
+    """Content hash of each payload row, indexed by start_date (last duplicate wins, as in the upsert)."""
+    frame = frame.drop_duplicates("start_date", keep="last")
+    return pd.Series(pd.util.hash_pandas_object(frame, index=False).to_numpy(), index=frame["start_date"].to_numpy())
+
+def upsert_in_batches(supabase, table, records, batch_size=DEFAULT_BATCH_SIZE, on_conflict="user,start_date"):
+    """
+    Upsert records in chunks of `batch_size`, one request per chunk.
+
+    `on_conflict` must match a unique constraint on `table` (see
+    migrations/001_unique_user_start_date.sql). Records sharing a conflict key
+    are collapsed to the last occurrence first, since Postgres rejects an
+    upsert that touches the same row twice. Returns a
+    summary dict with rows written, failed and skipped (duplicate keys).
+    """
+    key_cols = [c.strip() for c in on_conflict.split(",")]
+    unique = {}
+    for record in records:
+        unique[tuple(record[c] for c in key_cols)] = record
+    deduped = list(unique.values())
+
+    summary = {"table": table, "written": 0, "failed": 0,
+               "skipped": len(records) - len(deduped), "batches": 0}
+
+    for i in range(0, len(deduped), batch_size):
+        chunk = deduped[i:i + batch_size]
+        summary["batches"] += 1
+        try:
+            execute(supabase.table(table).upsert(chunk, on_conflict=on_conflict))
+            summary["written"] += len(chunk)
+        except Exception as e:
+            summary["failed"] += len(chunk)
+            logger.warning("Failed to write batch %d (%d rows) to %s: %s", summary["batches"], len(chunk), table, e)
+            continue
+        sampled_log("db_batch_written", level=logging.DEBUG, table=table, batch=summary["batches"], rows=len(chunk))
+
+    return summary
+
+def write_rundata_to_db(df: pd.DataFrame, user, batch_size=DEFAULT_BATCH_SIZE, supabase=None,
+                        mode=RUNDATA_WRITE_MODE):
+
+    if supabase is None:
+        supabase = get_client()
+
+    frame = _to_record_frame(df, RUNDATA_FLOAT_COLUMNS, ["type", "start_date"], user)
+    hashes = _row_hashes(frame)
+
+    # Taken out while writing, so a write that fails part-way leaves no snapshot
+    with _snapshot_lock:
+        previous = _rundata_snapshots.pop(user, None)
+
+    if mode == "sync":
+        summary = _write_rundata_sync(supabase, frame, user, batch_size)
+    elif mode == "diff" and previous is not None:
+        summary = _write_rundata_diff(supabase, frame, hashes, previous, user, batch_size)
+    else:
+        # Delete current user's data
+        execute(supabase.table("RunData").delete().eq("user", user))
+        summary = upsert_in_batches(supabase, "RunData", frame.to_dict(orient='records'), batch_size=batch_size)
+        summary["mode"] = "replace"
+
+    if summary["failed"] == 0:
+        with _snapshot_lock:
+            _rundata_snapshots[user] = hashes
+            while len(_rundata_snapshots) > RUNDATA_SNAPSHOT_MAX_USERS:
+                _rundata_snapshots.popitem(last=False)
+
+    logger.info("RunData written (%s): %d rows in %d batches, %d failed", summary["mode"], summary["written"], summary["batches"], summary["failed"])
+    return summary
+
+def _run_identity(start_date, distance) -> pd.MultiIndex:
+    """(start_date, distance) keys that compare equal whatever text/float form the DB returns."""
+    return pd.MultiIndex.from_arrays([
+        pd.to_datetime(pd.Series(start_date), format="ISO8601", utc=True, errors="coerce").dt.tz_localize(None).to_numpy(),
+        pd.to_numeric(pd.Series(distance), errors="coerce").round(3).to_numpy(),
+    ])
+
+def _write_rundata_sync(supabase, frame, user, batch_size):
+    """
+    Bring the user's RunData in line with `frame` using (user, start_date,
+    distance) as run identity: delete stored runs that are not in the export
+    (by id), then insert the export's runs that are not stored. Runs present
+    on both sides are left untouched.
+
+    New runs go out as upserts on (user, start_date) so a retried batch that
+    already landed is not rejected as a duplicate.
+    """
+    # dbReaders imports this module's column lists, so import it here
+    from dbReaders import fetch_runs
+
+    frame = frame.drop_duplicates("start_date", keep="last")
+    stored = fetch_runs(user, columns=["id", "start_date", "distance"], supabase=supabase)
+
+    incoming_keys = _run_identity(frame["start_date"], frame["distance"])
+    stored_keys = _run_identity(stored["start_date"], stored["distance"])
+
+    # A stored run is kept once; extra copies of the same identity are removed too
+    keep = stored_keys.isin(incoming_keys) & ~stored_keys.duplicated()
+    removed_ids = stored.loc[~keep, "id"].tolist()
+    new = ~incoming_keys.isin(stored_keys[keep])
+
+    summary = {"table": "RunData", "written": 0, "failed": 0, "skipped": 0, "batches": 0,
+               "mode": "sync", "unchanged": int(keep.sum()), "deleted": 0}
+
+    for i in range(0, len(removed_ids), batch_size):
+        chunk = removed_ids[i:i + batch_size]
         try:
-            supabase.table("RunData").insert(data_to_insert).execute()
-            count += 1
-            print(f"✅ Data successfully written to the database. Count: {count}")
+            execute(supabase.table("RunData").delete().eq("user", user).in_("id", chunk))
+            summary["deleted"] += len(chunk)
         except Exception as e:
-            print(f"❌ Failed to write data to the database. Error: {e}")
-
-def write_recent_activity_to_db(df: pd.DataFrame):
-
-    user = 'cb6541ac-4f5f-48ce-9f59-87260d595a27'
-
-    SUPABASE_URL = os.getenv('DB_URL')
-    SUPABASE_KEY = os.getenv('DB_KEY')
-
-    supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-
-    supabase.table("RecentActivity").delete().eq("user", user).execute()
-    print("Existing user data deleted.")
-
-    data = df.to_dict(orient='records')
-    print(data)
-
-    count = 0
-    for record in data:
-        data_to_insert = {
-            "start_date": record['start_date'],
-            "mileage_km_30d": float(record['mileage_km_30d']),
-            "mileage_miles_30d": float(record['mileage_miles_30d']),
-            "run_count_30d": float(record['run_count_30d']),
-            "longest_run_km_30d": float(record['longest_run_km_30d']),
-            "longest_run_miles_30d": float(record['longest_run_miles_30d']),
-            "avg_pace_sec_per_km_30d": float(record['avg_pace_sec_per_km_30d']),
-            "fastest_pace_sec_per_km_30d": float(record['fastest_pace_sec_per_km_30d']),
-            "avg_pace_sec_per_mile_30d": float(record['avg_pace_sec_per_mile_30d']),
-            "fastest_pace_sec_per_mile_30d": float(record['fastest_pace_sec_per_mile_30d']),
-            "avg_hr_30d": float(record['avg_hr_30d']),
-            "max_hr_30d": float(record['max_hr_30d']),
-            "elevation_gain_m_30d": float(record['elevation_gain_m_30d']),
-            "user": user
-        }
-    
+            summary["failed"] += len(chunk)
+            logger.warning("Failed to delete %d removed rows from RunData: %s", len(chunk), e)
+
+    inserted = upsert_in_batches(supabase, "RunData", frame[new].to_dict(orient='records'), batch_size=batch_size)
+    for key in ("written", "failed", "skipped", "batches"):
+        summary[key] += inserted[key]
+    return summary
+
+def _write_rundata_diff(supabase, frame, hashes, previous, user, batch_size):
+    """Upsert rows whose content is new and delete start_dates no longer in the export."""
+    frame = frame.drop_duplicates("start_date", keep="last")
+    changed = ~np.isin(hashes.to_numpy(), previous.to_numpy())
+    removed = previous.index.difference(hashes.index).tolist()
+
+    summary = upsert_in_batches(supabase, "RunData", frame[changed].to_dict(orient='records'), batch_size=batch_size)
+    summary.update(mode="diff", unchanged=int((~changed).sum()), deleted=0)
+
+    for i in range(0, len(removed), batch_size):
+        chunk = removed[i:i + batch_size]
         try:
-            supabase.table("RecentActivity").insert(data_to_insert).execute()
-            count += 1
-            print(f"✅ Recent activity successfully written to the database. Count: {count}")
+            execute(supabase.table("RunData").delete().eq("user", user).in_("start_date", chunk))
+            summary["deleted"] += len(chunk)
         except Exception as e:
-            print(f"❌ Failed to write recent activity to the database. Error: {e}")
+            summary["failed"] += len(chunk)
+            logger.warning("Failed to delete %d removed rows from RunData: %s", len(chunk), e)
+
+    return summary
+
+def write_recent_activity_to_db(df: pd.DataFrame, user, batch_size=DEFAULT_BATCH_SIZE, supabase=None):
+
+    if supabase is None:
+        supabase = get_client()
+
+    execute(supabase.table("RecentActivity").delete().eq("user", user))
+
+    records = _to_records(df, RECENT_ACTIVITY_FLOAT_COLUMNS, ["start_date"], user)
+    summary = upsert_in_batches(supabase, "RecentActivity", records, batch_size=batch_size)
+
+    logger.info("RecentActivity written: %d rows in %d batches, %d failed", summary["written"], summary["batches"], summary["failed"])
+    return summary
+
+def _flush_rundata(df, user, mode=RUNDATA_WRITE_MODE):
+    with metrics.stage("rundata_write", rows_in=len(df), user=user) as stage:
+        summary = write_rundata_to_db(df, user=user, mode=mode)
+        stage.rows_out = summary["written"]
+    return summary
+
+def _flush_recent_activity(df, user):
+    with metrics.stage("recent_activity_write", rows_in=len(df), user=user) as stage:
+        summary = write_recent_activity_to_db(df, user=user)
+        stage.rows_out = summary["written"]
+    return summary
+
+# Background persistence for uploads; see writeBehind for retry and spooling
+write_behind = WriteBehindWriter({"RunData": _flush_rundata, "RecentActivity": _flush_recent_activity})
+register_shutdown(write_behind)
@@ -0,0 +1,114 @@
+"""
+Process-wide database client.
+
+The client is built lazily on first use and then shared, so every writer and
+reader reuses one pooled, keep-alive HTTP session instead of paying for a new
+Supabase client and TLS handshake per call.
+
+Configuration (environment):
+    DB_URL, DB_KEY      Supabase project URL and key
+    DB_BACKEND          "supabase" (default) or "local" for the in-memory stand-in
+    DB_TIMEOUT          per-request timeout in seconds (default 10)
+    DB_MAX_RETRIES      retries for transient failures (default 3)
+    DB_BACKOFF          base backoff in seconds, doubled per retry (default 0.5)
+    DB_POOL_SIZE        max pooled connections (default 10)
+"""
+import os
+import threading
+import time
+
+DB_TIMEOUT = float(os.getenv('DB_TIMEOUT', 10))
+DB_MAX_RETRIES = int(os.getenv('DB_MAX_RETRIES', 3))
+DB_BACKOFF = float(os.getenv('DB_BACKOFF', 0.5))
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+
+_client = None
+_backend = None
+_lock = threading.Lock()
+
+
+def supabase_backend():
+    """Build a Supabase client on top of a pooled, keep-alive httpx session."""
+    import httpx
+    from supabase import create_client, ClientOptions
+
+    http = httpx.Client(
+        timeout=httpx.Timeout(DB_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=DB_POOL_SIZE,
+            max_keepalive_connections=DB_POOL_SIZE,
+            keepalive_expiry=60,
+        ),
+    )
+    options = ClientOptions(postgrest_client_timeout=DB_TIMEOUT, httpx_client=http)
+    return create_client(os.getenv('DB_URL'), os.getenv('DB_KEY'), options=options)
+
+
+def local_backend():
+    from localDb import LocalClient
+    return LocalClient()
+
+
+BACKENDS = {
+    "supabase": supabase_backend,
+    "local": local_backend,
+}
+
+
+def set_backend(factory):
+    """Swap the factory used to build the shared client (e.g. an in-memory fake in tests)."""
+    global _backend, _client
+    with _lock:
+        _backend = factory
+        _client = None
+
+
+def set_client(client):
+    """Install an already-built client as the shared instance."""
+    global _client
+    with _lock:
+        _client = client
+
+
+def reset_client():
+    global _client
+    with _lock:
+        _client = None
+
+
+def get_client():
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                factory = _backend or BACKENDS[os.getenv('DB_BACKEND', 'supabase')]
+                _client = factory()
+    return _client
+
+
+def _is_transient(exc):
+    if isinstance(exc, (ConnectionError, TimeoutError)):
+        return True
+    try:
+        import httpx
+    except ImportError:
+        return False
+    return isinstance(exc, httpx.TransportError)
+
+
+def execute(query, retries=None, backoff=None):
+    """
+    Run `query.execute()`, retrying transient network failures with
+    exponential backoff. Errors reported by the database itself are raised
+    straight away.
+    """
+    retries = DB_MAX_RETRIES if retries is None else retries
+    backoff = DB_BACKOFF if backoff is None else backoff
+
+    for attempt in range(retries + 1):
+        try:
+            return query.execute()
+        except Exception as e:
+            if attempt == retries or not _is_transient(e):
+                raise
+            time.sleep(backoff * (2 ** attempt))
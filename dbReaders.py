@@ -0,0 +1,93 @@
+"""
+Read side of the RunData and RecentActivity tables.
+
+Queries select only the requested columns and page through results with
+range() so no single request asks PostgREST for more than `page_size` rows
+(its default response cap is 1000). Stored runs come back as an
+ActivityStore, ready for the rolling/label stages without another upload.
+The exact total behind a page is an extra count over every matching row, so
+it is only requested when the caller asks for it.
+
+Configuration (environment):
+    DB_READ_PAGE_SIZE    rows per select request (default 1000)
+"""
+import os
+
+import pandas as pd
+
+from dbClient import get_client, execute
+from vdot_ml_model.activityStore import ActivityStore, STORE_DTYPES
+from dataPrep import RUNDATA_FLOAT_COLUMNS, RECENT_ACTIVITY_FLOAT_COLUMNS
+
+READ_PAGE_SIZE = int(os.getenv('DB_READ_PAGE_SIZE', 1000))
+
+RUNDATA_COLUMNS = ["start_date", "type"] + RUNDATA_FLOAT_COLUMNS
+RECENT_ACTIVITY_COLUMNS = ["start_date"] + RECENT_ACTIVITY_FLOAT_COLUMNS
+
+# What the pipeline stages need to rebuild features from stored runs
+STORE_COLUMNS = list(STORE_DTYPES)
+
+
+def parse_bound(value):
+    """A since/until bound in the stored start_date format (UTC), or None. Raises ValueError if unparseable."""
+    if value is None or value == "":
+        return None
+    ts = pd.Timestamp(value)
+    if ts is pd.NaT:
+        raise ValueError(f"not a date: {value!r}")
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert("UTC").tz_localize(None)
+    return ts.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _runs_query(supabase, user, columns, since=None, until=None, count=False):
+    query = supabase.table("RunData").select(",".join(columns), count="exact" if count else None).eq("user", user)
+    since, until = parse_bound(since), parse_bound(until)
+    if since is not None:
+        query = query.gte("start_date", since)
+    if until is not None:
+        query = query.lt("start_date", until)
+    return query.order("start_date")
+
+
+def fetch_runs_page(user, offset=0, limit=READ_PAGE_SIZE, columns=RUNDATA_COLUMNS, since=None, until=None,
+                    count=False, supabase=None):
+    """One page of a user's runs, oldest first. Returns (rows, total matching rows if `count` else None)."""
+    if supabase is None:
+        supabase = get_client()
+
+    query = _runs_query(supabase, user, columns, since, until, count=count)
+    response = execute(query.range(offset, offset + limit - 1))
+    return response.data, response.count if count else None
+
+
+def fetch_runs(user, columns=RUNDATA_COLUMNS, since=None, until=None, page_size=READ_PAGE_SIZE, supabase=None) -> pd.DataFrame:
+    """All of a user's runs (optionally within [since, until)), fetched page by page."""
+    if supabase is None:
+        supabase = get_client()
+
+    rows = []
+    offset = 0
+    while True:
+        page, _ = fetch_runs_page(user, offset, page_size, columns, since, until, supabase=supabase)
+        rows.extend(page)
+        if len(page) < page_size:
+            break
+        offset += page_size
+
+    return pd.DataFrame(rows, columns=columns)
+
+
+def load_activity_store(user, supabase=None) -> ActivityStore:
+    """A user's stored runs as an ActivityStore, reading only the columns it keeps."""
+    return ActivityStore.from_frame(fetch_runs(user, columns=STORE_COLUMNS, supabase=supabase))
+
+
+def fetch_recent_activity(user, columns=RECENT_ACTIVITY_COLUMNS, supabase=None):
+    """The user's stored recent-activity feature row, or None if there is none."""
+    if supabase is None:
+        supabase = get_client()
+
+    query = supabase.table("RecentActivity").select(",".join(columns)).eq("user", user)
+    rows = execute(query.order("start_date", desc=True).range(0, 0)).data
+    return rows[0] if rows else None
@@ -1,5 +1,16 @@
-from scipy.interpolate import interp1d
-import pandas as pd
+from functools import lru_cache
+import logging
+import os
+
+import numpy as np
+
+from vdot_ml_model.danielsFormula import race_time
+from pipelineMetrics import sampled_log
+
+# How race times are computed from a VDOT:
+#   "table"    interpolate the Daniels tables below (extrapolates outside 30-85)
+#   "formula"  solve the Daniels formula directly (danielsFormula.race_time)
+RACE_TIME_ENGINE = os.getenv('RACE_TIME_ENGINE', 'table')
 
 # Convert MM:SS or M:SS:SS format to seconds
 def time_to_seconds(time_str):
@@ -22,34 +33,125 @@ times_half_mara = ['2:21:04', '2:13:49', '2:07:16', '2:01:19', '1:55:55', '1:50:
 times_marathon = ['4:49:17', '4:34:59', '4:22:03', '4:10:19', '3:59:35', '3:49:45', '3:40:43', '3:32:23', '3:28:26', '3:24:39', '3:21:00', '3:17:29', '3:14:06', '3:10:49', '3:07:39', '3:04:36', '3:01:39', '2:58:47', '2:56:01', '2:53:30', '2:50:45', '2:48:14', '2:45:47', '2:43:25',
                    '2:41:08', '2:38:54', '2:36:44', '2:34:38', '2:32:35', '2:30:36', '2:28:40', '2:26:47', '2:24:57', '2:23:10', '2:21:26', '2:19:44', '2:18:05', '2:16:29', '2:14:55', '2:13:23', '2:11:54', '2:10:27', '2:09:02', '2:07:38', '2:06:17', '2:04:57', '2:03:40', '2:02:24', '2:01:10']
 
-# Convert all times to seconds
-vdot_data = {
-    'VDOT': vdot_raw,
-    '5000': [time_to_seconds(t) for t in times_5000],
-    '1/2 Marathon': [time_to_seconds(t) for t in times_half_mara],
-    'Marathon': [time_to_seconds(t) for t in times_marathon]
+# Distances below are not in the hand-typed table above; they were generated
+# from the Daniels VDOT formula (labelVdot.calculate_vdot) and rounded to the second.
+times_1500 = ['8:30', '8:02', '7:36', '7:14', '6:54', '6:35', '6:18', '6:03', '5:56', '5:49', '5:42', '5:36', '5:30', '5:24', '5:18', '5:13', '5:07', '5:02', '4:57', '4:53', '4:48', '4:44', '4:39', '4:35',
+              '4:31', '4:27', '4:24', '4:20', '4:16', '4:13', '4:10', '4:06', '4:03', '4:00', '3:57', '3:54', '3:52', '3:49', '3:46', '3:44', '3:41', '3:39', '3:36', '3:34', '3:32', '3:29', '3:27', '3:25', '3:23']
+
+times_mile = ['9:10', '8:40', '8:13', '7:49', '7:27', '7:07', '6:49', '6:32', '6:24', '6:17', '6:10', '6:03', '5:56', '5:50', '5:44', '5:38', '5:32', '5:27', '5:21', '5:16', '5:11', '5:06', '5:02', '4:57',
+              '4:53', '4:49', '4:45', '4:41', '4:37', '4:33', '4:30', '4:26', '4:23', '4:19', '4:16', '4:13', '4:10', '4:07', '4:04', '4:01', '3:59', '3:56', '3:53', '3:51', '3:48', '3:46', '3:44', '3:41', '3:39']
+
+times_3000 = ['17:56', '16:59', '16:08', '15:22', '14:40', '14:02', '13:27', '12:55', '12:40', '12:25', '12:11', '11:58', '11:45', '11:33', '11:21', '11:09', '10:58', '10:47', '10:37', '10:27', '10:17', '10:08', '9:59', '9:50',
+              '9:41', '9:33', '9:25', '9:17', '9:09', '9:02', '8:55', '8:48', '8:41', '8:35', '8:28', '8:22', '8:16', '8:10', '8:04', '7:59', '7:53', '7:48', '7:42', '7:37', '7:32', '7:28', '7:23', '7:18', '7:14']
+
+times_10000 = ['1:03:49', '1:00:27', '57:25', '54:42', '52:15', '50:01', '47:58', '46:06', '45:13', '44:23', '43:34', '42:48', '42:03', '41:20', '40:38', '39:58', '39:19', '38:42', '38:06', '37:31', '36:57', '36:24', '35:53', '35:22',
+               '34:52', '34:23', '33:55', '33:28', '33:02', '32:36', '32:12', '31:47', '31:24', '31:01', '30:39', '30:17', '29:56', '29:35', '29:15', '28:56', '28:37', '28:18', '28:00', '27:42', '27:25', '27:08', '26:51', '26:35', '26:19']
+
+times_15000 = ['1:38:21', '1:33:09', '1:28:30', '1:24:18', '1:20:30', '1:17:02', '1:13:52', '1:10:58', '1:09:37', '1:08:18', '1:07:03', '1:05:50', '1:04:41', '1:03:34', '1:02:29', '1:01:27', '1:00:26', '59:28', '58:32', '57:38', '56:46', '55:55', '55:06', '54:18',
+               '53:32', '52:47', '52:04', '51:22', '50:41', '50:02', '49:23', '48:46', '48:09', '47:34', '46:59', '46:26', '45:53', '45:21', '44:50', '44:20', '43:50', '43:22', '42:54', '42:26', '41:59', '41:33', '41:08', '40:43', '40:18']
+
+time_strings = {
+    '1500': times_1500,
+    'Mile': times_mile,
+    '3000': times_3000,
+    '5000': times_5000,
+    '10000': times_10000,
+    '15000': times_15000,
+    '1/2 Marathon': times_half_mara,
+    'Marathon': times_marathon
+}
+
+DISTANCES = list(time_strings)
+DISTANCE_METRES = {
+    '1500': 1500.0,
+    'Mile': 1609.344,
+    '3000': 3000.0,
+    '5000': 5000.0,
+    '10000': 10000.0,
+    '15000': 15000.0,
+    '1/2 Marathon': 21097.5,
+    'Marathon': 42195.0,
 }
+DEFAULT_DISTANCES = ['5000', '1/2 Marathon', 'Marathon']
 
-# Create DataFrame
-df = pd.DataFrame(vdot_data)
+@lru_cache(maxsize=None)
+def lookup_tables():
+    """
+    (VDOT column, time matrix) with one row per VDOT in vdot_raw and one
+    column per distance in DISTANCES, in seconds. Built on first use rather
+    than at import so the service starts without parsing the table.
+    """
+    vdot_table = np.array(vdot_raw, dtype=float)
+    time_table = np.column_stack([[time_to_seconds(t) for t in time_strings[d]] for d in DISTANCES])
+    return vdot_table, time_table
 
-# Create interpolation functions for each metric
-interpolators = {}
-for metric in ['5000', '1/2 Marathon', 'Marathon']:
-    interpolators[metric] = interp1d(df['VDOT'], df[metric], kind='linear', fill_value='extrapolate')
+def get_times_batch(vdots, distances=DEFAULT_DISTANCES, engine=None):
+    """
+    Race times in seconds for an array of VDOTs, for every requested distance.
 
-def get_times(vdot):
+    With engine="table" (the default unless RACE_TIME_ENGINE says otherwise)
+    this is piecewise-linear in VDOT over the table, extrapolating from the
+    end segments outside 30-85 like the original interp1d tables. With
+    engine="formula" the times come from the Daniels formula for any VDOT.
+    Returns a dict of distance -> array with the same shape as `vdots`.
+    """
+    vdots = np.asarray(vdots, dtype=float)
+    if (engine or RACE_TIME_ENGINE) == "formula":
+        times = race_time(vdots[..., None], [DISTANCE_METRES[d] for d in distances])
+        return {d: times[..., i] for i, d in enumerate(distances)}
+
+    vdot_table, time_table = lookup_tables()
+    cols = [DISTANCES.index(d) for d in distances]
+
+    idx = np.clip(np.searchsorted(vdot_table, vdots, side='right') - 1, 0, len(vdot_table) - 2)
+    frac = (vdots - vdot_table[idx]) / (vdot_table[idx + 1] - vdot_table[idx])
+
+    lo = time_table[idx][..., cols]
+    hi = time_table[idx + 1][..., cols]
+    times = lo + frac[..., None] * (hi - lo)
+
+    return {d: times[..., i] for i, d in enumerate(distances)}
+
+def get_times(vdot, distances=DEFAULT_DISTANCES, engine=None):
     """Get race times for a given VDOT value. Returns times in seconds."""
-    if vdot < df['VDOT'].min() or vdot > df['VDOT'].max():
-        print(f"Warning: VDOT {vdot} is outside the range {df['VDOT'].min()}-{df['VDOT'].max()}. Extrapolating.")
+    engine = engine or RACE_TIME_ENGINE
+    if engine == "table" and (vdot < vdot_raw[0] or vdot > vdot_raw[-1]):
+        # Sampled: batch callers can hit this once per athlete
+        sampled_log("vdot_outside_table", level=logging.WARNING, vdot=float(vdot),
+                    table_min=vdot_raw[0], table_max=vdot_raw[-1])
     
     results = {'VDOT': vdot}
-    for metric in ['5000', '1/2 Marathon', 'Marathon']:
-        time_seconds = float(interpolators[metric](vdot))
-        results[metric] = time_seconds
+    for metric, time_seconds in get_times_batch(vdot, distances, engine=engine).items():
+        results[metric] = float(time_seconds)
     
     return results
 
+class VdotGrid:
+    """
+    Race times pre-tabulated on a dense, evenly spaced VDOT grid.
+
+    A lookup is an index computation rather than a search, so serving many
+    users or plotting whole prediction curves costs O(1) per VDOT. Lookups
+    interpolate between the two neighbouring grid points; since the table's
+    knots fall on the grid, results match get_times_batch inside the range.
+    """
+
+    def __init__(self, lo=20.0, hi=90.0, step=0.01, distances=DISTANCES):
+        self.lo = lo
+        self.step = step
+        self.distances = list(distances)
+        self.vdots = lo + step * np.arange(int(round((hi - lo) / step)) + 1)
+        self.times = np.column_stack(list(get_times_batch(self.vdots, self.distances).values()))
+
+    def lookup(self, vdots, distances=None):
+        """Times for each VDOT (clamped to the grid range) as a dict of distance -> array."""
+        pos = np.clip((np.asarray(vdots, dtype=float) - self.lo) / self.step, 0, len(self.vdots) - 1)
+        idx = np.minimum(pos.astype(np.int64), len(self.vdots) - 2)
+        frac = (pos - idx)[..., None]
+        rows = self.times[idx] + frac * (self.times[idx + 1] - self.times[idx])
+        distances = self.distances if distances is None else distances
+        return {d: rows[..., self.distances.index(d)] for d in distances}
+
 def seconds_to_time(seconds):
     total_secs = int(round(seconds))
     hours = total_secs // 3600
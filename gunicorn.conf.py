@@ -0,0 +1,52 @@
+"""
+Gunicorn settings for serving wsgi:app in production.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Uses threaded (gthread) workers. A pipeline run spends much of its time in
+pandas/NumPy and in DB round trips, both of which release the GIL, and the
+SSE progress stream holds a thread for the length of an upload.
+
+Keep one worker unless requests are routed to workers by user. These live in
+process memory:
+- async upload jobs (/api/jobs/<id>);
+- the upload cache;
+- rolling-window state and RunData snapshots;
+- the per-user pipeline limits.
+A second worker sees none of them. Scale threads first, then add workers
+behind sticky routing on X-User-Id.
+
+Configuration (environment):
+    PORT                 port to bind on all interfaces (default 5000)
+    WEB_CONCURRENCY      worker processes (default 1)
+    GUNICORN_THREADS     threads per worker (default 4 x CPU count)
+    GUNICORN_TIMEOUT     seconds a silent worker may hang before a restart (default 120)
+    GUNICORN_KEEPALIVE   seconds to hold idle keep-alive connections (default 5)
+    GUNICORN_MAX_REQUESTS  restart a worker after this many requests, 0 = never (default 0)
+"""
+import os
+import sys
+
+bind = f"0.0.0.0:{os.getenv('PORT', 5000)}"
+workers = int(os.getenv('WEB_CONCURRENCY', 1))
+worker_class = "gthread"
+threads = int(os.getenv('GUNICORN_THREADS', 4 * (os.cpu_count() or 1)))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = max_requests // 10
+
+# Import wsgi (and so app.preload()) in the master, before the fork
+preload_app = True
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.getenv('LOG_LEVEL', 'info').lower()
+
+
+def worker_exit(server, worker):
+    # Give queued DB writes a chance to land (or reach the spool) before the worker goes
+    data_prep = sys.modules.get("dataPrep")
+    if data_prep is not None:
+        data_prep.write_behind.close(timeout=graceful_timeout - 5)
@@ -0,0 +1,160 @@
+import json
+import time
+import threading
+from itertools import count
+
+
+class LocalResponse:
+    """Mirrors the `.data` / `.count` shape of a supabase-py APIResponse."""
+
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+class LocalQuery:
+    """Minimal stand-in for the supabase-py query builder.
+
+    Supports the subset of the builder the pipeline uses: select, insert,
+    upsert and delete, narrowed with eq/in_/gte/lt filters and paged with range.
+    """
+
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.action = "select"
+        self.payload = None
+        self.columns = None
+        self.on_conflict = None
+        self.filters = []
+        self.order_by = None
+        self.bounds = None
+
+    def select(self, columns="*", count=None):
+        # The total is always reported, so `count` is accepted and ignored
+        self.action = "select"
+        self.columns = None if columns.strip() == "*" else [c.strip() for c in columns.split(",")]
+        return self
+
+    def insert(self, rows):
+        self.action = "insert"
+        self.payload = rows if isinstance(rows, list) else [rows]
+        return self
+
+    def upsert(self, rows, on_conflict=""):
+        self.action = "upsert"
+        self.payload = rows if isinstance(rows, list) else [rows]
+        self.on_conflict = [c.strip() for c in on_conflict.split(",") if c.strip()]
+        return self
+
+    def delete(self):
+        self.action = "delete"
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def in_(self, column, values):
+        values = set(values)
+        self.filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def gte(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None and row.get(column) >= value)
+        return self
+
+    def lt(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None and row.get(column) < value)
+        return self
+
+    def order(self, column, desc=False):
+        self.order_by = (column, desc)
+        return self
+
+    def range(self, start, end):
+        self.bounds = (start, end)
+        return self
+
+    def _matches(self, row):
+        return all(f(row) for f in self.filters)
+
+    def execute(self):
+        return self.client._execute(self)
+
+
+class LocalClient:
+    """In-process stand-in for a supabase `Client`.
+
+    Rows are kept in plain lists per table. `latency` adds a fixed sleep to
+    every `execute()` so write paths can be benchmarked against a realistic
+    round-trip cost, and `calls` counts round trips per table. Written rows
+    go through JSON the way the HTTP client sends them (NaN is rejected), so
+    a payload the real API would refuse fails here too.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.tables = {}
+        self.calls = {}
+        self._ids = count(1)
+        self._lock = threading.Lock()
+
+    def table(self, name):
+        return LocalQuery(self, name)
+
+    def rows(self, name):
+        return list(self.tables.get(name, []))
+
+    def _execute(self, query):
+        if self.latency:
+            time.sleep(self.latency)
+
+        payload = query.payload
+        if payload is not None:
+            payload = json.loads(json.dumps(payload, allow_nan=False))
+
+        with self._lock:
+            self.calls[query.table] = self.calls.get(query.table, 0) + 1
+            rows = self.tables.setdefault(query.table, [])
+
+            if query.action == "insert":
+                inserted = [dict(r, id=next(self._ids)) for r in payload]
+                rows.extend(inserted)
+                return LocalResponse(inserted)
+
+            if query.action == "upsert":
+                key_cols = query.on_conflict or ["id"]
+                index = {tuple(r.get(c) for c in key_cols): i for i, r in enumerate(rows)}
+                written = []
+                for r in payload:
+                    key = tuple(r.get(c) for c in key_cols)
+                    if key in index:
+                        rows[index[key]].update(r)
+                        written.append(rows[index[key]])
+                    else:
+                        new_row = dict(r, id=next(self._ids))
+                        index[key] = len(rows)
+                        rows.append(new_row)
+                        written.append(new_row)
+                return LocalResponse(written)
+
+            if query.action == "delete":
+                kept = [r for r in rows if not query._matches(r)]
+                deleted = [r for r in rows if query._matches(r)]
+                self.tables[query.table] = kept
+                return LocalResponse(deleted)
+
+            selected = [r for r in rows if query._matches(r)]
+            if query.order_by is not None:
+                column, desc = query.order_by
+                selected.sort(key=lambda r: r.get(column), reverse=desc)
+            total = len(selected)
+            if query.bounds is not None:
+                start, end = query.bounds
+                selected = selected[start:end + 1]
+            if query.columns is not None:
+                selected = [{c: r.get(c) for c in query.columns} for r in selected]
+            else:
+                selected = [dict(r) for r in selected]
+            return LocalResponse(selected, count=total)
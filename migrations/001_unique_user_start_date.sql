@@ -0,0 +1,26 @@
+-- Unique (user, start_date) on RunData and RecentActivity.
+--
+-- dataPrep.upsert_in_batches writes with on_conflict=user,start_date. PostgREST
+-- only accepts that when a unique constraint or index covers exactly those
+-- columns; without one every upsert fails with 42P10.
+--
+-- Run once in the Supabase SQL editor (or psql) before deploying.
+
+begin;
+
+-- Keep one copy of any (user, start_date) stored more than once
+delete from "RunData" a
+using "RunData" b
+where a."user" = b."user" and a.start_date = b.start_date and a.ctid < b.ctid;
+
+alter table "RunData"
+    add constraint "RunData_user_start_date_key" unique ("user", start_date);
+
+delete from "RecentActivity" a
+using "RecentActivity" b
+where a."user" = b."user" and a.start_date = b.start_date and a.ctid < b.ctid;
+
+alter table "RecentActivity"
+    add constraint "RecentActivity_user_start_date_key" unique ("user", start_date);
+
+commit;
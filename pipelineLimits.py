@@ -0,0 +1,85 @@
+"""
+Concurrency limits for pipeline runs.
+
+Every pipeline run (upload, forecast, a summary rebuilt from stored runs)
+takes a slot from a PipelineLimiter, which enforces two limits:
+
+- One run per user at a time. A user's in-process state (cached rolling
+  windows, the RunData snapshot, the upload cache entry) is only ever touched
+  by one run, and a second upload of theirs waits for the first.
+- At most `max_concurrent` runs across all users, so a burst of athletes
+  cannot oversubscribe CPU and memory.
+
+The per-user lock is taken first. A user queued behind their own run does not
+hold one of the global slots while waiting.
+
+Callers that answer an HTTP request pass a timeout and map UserBusy /
+PipelineBusy to 429 / 503. Background jobs wait without a timeout, since
+UPLOAD_MAX_PENDING already bounds them.
+
+Configuration (environment):
+    PIPELINE_MAX_CONCURRENT   pipeline runs across all users (default: CPU count)
+    PIPELINE_WAIT             seconds a request waits for a slot (default 30)
+"""
+import os
+import threading
+from contextlib import contextmanager
+
+PIPELINE_MAX_CONCURRENT = int(os.getenv('PIPELINE_MAX_CONCURRENT', os.cpu_count() or 2))
+PIPELINE_WAIT = float(os.getenv('PIPELINE_WAIT', 30))
+
+
+class UserBusy(Exception):
+    pass
+
+
+class PipelineBusy(Exception):
+    pass
+
+
+class PipelineLimiter:
+
+    def __init__(self, max_concurrent=PIPELINE_MAX_CONCURRENT):
+        self.max_concurrent = max_concurrent
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._users = {}   # user -> [lock, runs holding or waiting for it]
+        self._lock = threading.Lock()
+        self._running = 0
+
+    @contextmanager
+    def slot(self, user, timeout=None):
+        """Hold `user`'s lock and one global slot for the body of the block."""
+        with self._lock:
+            entry = self._users.setdefault(user, [threading.Lock(), 0])
+            entry[1] += 1
+
+        try:
+            if not entry[0].acquire(timeout=-1 if timeout is None else timeout):
+                raise UserBusy(f"a pipeline run for user {user} is already in progress")
+            try:
+                if not self._slots.acquire(timeout=timeout):
+                    raise PipelineBusy(f"{self.max_concurrent} pipeline runs already in progress")
+                with self._lock:
+                    self._running += 1
+                try:
+                    yield
+                finally:
+                    with self._lock:
+                        self._running -= 1
+                    self._slots.release()
+            finally:
+                entry[0].release()
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._users[user]
+
+    def running(self):
+        with self._lock:
+            return self._running
+
+    def waiting(self):
+        """Runs holding or waiting for a user lock, minus those already running."""
+        with self._lock:
+            return sum(count for _, count in self._users.values()) - self._running
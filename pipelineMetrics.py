@@ -0,0 +1,170 @@
+"""
+Stage-level instrumentation for the upload pipeline.
+
+Each stage of clean_and_build_dataset runs inside `metrics.stage(...)`, which
+records wall time, rows in/out and, when PIPELINE_TRACE_MEMORY=1, how far
+tracemalloc's peak rose above the allocation at the start of the stage. Aggregates are exposed in Prometheus text
+format by /api/metrics, and every stage emits one structured (JSON) log line.
+
+tracemalloc slows pandas down noticeably and its peak is process-wide, so
+memory tracing is off by default and per-stage peaks are only exact when one
+upload runs at a time. The process RSS high-water mark is always reported.
+
+Per-item events (DB batches, etc.) go through `sampled_log`, which logs the
+first and then every LOG_SAMPLE_EVERY-th occurrence of each event.
+"""
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PIPELINE_TRACE_MEMORY = os.getenv('PIPELINE_TRACE_MEMORY') == '1'
+LOG_SAMPLE_EVERY = int(os.getenv('LOG_SAMPLE_EVERY', 100))
+
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+logger = logging.getLogger("stryde.pipeline")
+
+
+class StageRecord:
+    """Handed to the body of a `with metrics.stage(...)` block to report row counts."""
+
+    def __init__(self, name, rows_in=None):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.seconds = None
+        self.peak_memory_bytes = None
+
+
+class PipelineMetrics:
+
+    def __init__(self, trace_memory=PIPELINE_TRACE_MEMORY):
+        self.trace_memory = trace_memory
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name, rows_in=None, **log_fields):
+        record = StageRecord(name, rows_in)
+        baseline = 0
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+
+        start = time.perf_counter()
+        failed = False
+        try:
+            yield record
+        except Exception:
+            failed = True
+            raise
+        finally:
+            record.seconds = time.perf_counter() - start
+            if self.trace_memory:
+                record.peak_memory_bytes = max(tracemalloc.get_traced_memory()[1] - baseline, 0)
+            self._observe(record, failed)
+            logger.info(json.dumps({
+                "event": "pipeline_stage",
+                "stage": name,
+                "seconds": round(record.seconds, 6),
+                "rows_in": record.rows_in,
+                "rows_out": record.rows_out,
+                "peak_memory_bytes": record.peak_memory_bytes,
+                "failed": failed,
+                **log_fields,
+            }))
+
+    def _observe(self, record, failed):
+        with self._lock:
+            agg = self._stages.setdefault(record.name, {
+                "count": 0,
+                "failures": 0,
+                "seconds_sum": 0.0,
+                "buckets": [0] * len(DURATION_BUCKETS),
+                "rows_in": 0,
+                "rows_out": 0,
+                "peak_memory_bytes": 0,
+            })
+            agg["count"] += 1
+            agg["failures"] += int(failed)
+            agg["seconds_sum"] += record.seconds
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if record.seconds <= bound:
+                    agg["buckets"][i] += 1
+            agg["rows_in"] += record.rows_in or 0
+            agg["rows_out"] += record.rows_out or 0
+            if record.peak_memory_bytes is not None:
+                agg["peak_memory_bytes"] = max(agg["peak_memory_bytes"], record.peak_memory_bytes)
+
+    def snapshot(self):
+        with self._lock:
+            return {name: dict(agg, buckets=list(agg["buckets"])) for name, agg in self._stages.items()}
+
+    def render_prometheus(self):
+        stages = self.snapshot()
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        family("stryde_pipeline_stage_duration_seconds", "histogram", "Wall time per pipeline stage.")
+        for stage, agg in sorted(stages.items()):
+            for bound, count in zip(DURATION_BUCKETS, agg["buckets"]):
+                lines.append(f'stryde_pipeline_stage_duration_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}')
+            lines.append(f'stryde_pipeline_stage_duration_seconds_bucket{{stage="{stage}",le="+Inf"}} {agg["count"]}')
+            lines.append(f'stryde_pipeline_stage_duration_seconds_sum{{stage="{stage}"}} {agg["seconds_sum"]:.6f}')
+            lines.append(f'stryde_pipeline_stage_duration_seconds_count{{stage="{stage}"}} {agg["count"]}')
+
+        for metric, key, help_text in (
+            ("stryde_pipeline_stage_rows_in_total", "rows_in", "Rows entering each stage."),
+            ("stryde_pipeline_stage_rows_out_total", "rows_out", "Rows produced by each stage."),
+            ("stryde_pipeline_stage_failures_total", "failures", "Stage runs that raised."),
+        ):
+            family(metric, "counter", help_text)
+            for stage, agg in sorted(stages.items()):
+                lines.append(f'{metric}{{stage="{stage}"}} {agg[key]}')
+
+        if self.trace_memory:
+            family("stryde_pipeline_stage_peak_memory_bytes", "gauge", "Largest allocation peak above the starting level seen during each stage.")
+            for stage, agg in sorted(stages.items()):
+                lines.append(f'stryde_pipeline_stage_peak_memory_bytes{{stage="{stage}"}} {agg["peak_memory_bytes"]}')
+
+        if resource is not None:
+            # ru_maxrss is in kilobytes on Linux, bytes on macOS
+            max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            if sys.platform != "darwin":
+                max_rss *= 1024
+            family("stryde_process_max_rss_bytes", "gauge", "Peak resident set size of this process.")
+            lines.append(f"stryde_process_max_rss_bytes {max_rss}")
+
+        return "\n".join(lines) + "\n"
+
+
+_sample_counts = {}
+_sample_lock = threading.Lock()
+
+
+def sampled_log(event, level=logging.INFO, every=None, **fields):
+    """Log the 1st, then every `every`-th occurrence of `event` as a JSON line."""
+    every = every or LOG_SAMPLE_EVERY
+    with _sample_lock:
+        n = _sample_counts.get(event, 0)
+        _sample_counts[event] = n + 1
+    if n % every == 0:
+        logger.log(level, json.dumps({"event": event, "occurrence": n + 1, "sample_every": every, **fields}))
+
+
+metrics = PipelineMetrics()
@@ -0,0 +1,125 @@
+import hashlib
+import io
+
+import pytest
+
+import dbClient
+from app import create_app
+from benchmarks.syntheticData import strava_export_bytes
+
+
+@pytest.fixture
+def client():
+    import app
+
+    dbClient.set_backend(dbClient.local_backend)
+    app.upload_cache.clear()
+    app.summary_cache.clear()
+    yield create_app().test_client()
+    dbClient.set_backend(None)
+
+
+def export(n=60, filename="export.csv"):
+    return {"file": (io.BytesIO(strava_export_bytes(n)), filename)}
+
+
+def test_forecast_failure_is_422_without_details(client, monkeypatch):
+    import vdot_ml_model.variableVdotPredictor_v2 as predictor
+
+    monkeypatch.setattr(predictor, "forecast_vdot_horizons",
+                        lambda *args, **kwargs: {"error": "internal detail", "message": "Failed"})
+    resp = client.post("/api/forecast", data=export())
+
+    assert resp.status_code == 422
+    assert resp.get_json() == {"error": "Not enough training history to forecast"}
+
+
+@pytest.mark.parametrize("path", ["/api/upload-data", "/api/upload-data/stream"])
+@pytest.mark.parametrize("filename, query", [
+    (None, ""),
+    ("", ""),
+    ("export.txt", ""),
+    ("export.csv", "?write=bogus"),
+])
+def test_upload_routes_validate_the_same_way(client, path, filename, query):
+    data = {} if filename is None else export(filename=filename)
+    resp = client.post(path + query, data=data)
+    assert resp.status_code == 400
+
+
+def test_runs_rejects_unparseable_bounds(client):
+    assert client.get("/api/runs?since=soon").status_code == 400
+    assert client.get("/api/runs?until=2024-02-30").status_code == 400
+    assert client.get("/api/runs?since=2024-01-01").status_code == 200
+
+
+def test_summary_does_not_evict_the_upload_digest(client, monkeypatch):
+    import app
+    import dbReaders
+    from dataPrep import write_behind
+
+    data = strava_export_bytes(400)
+    digest = hashlib.sha256(data).hexdigest()
+    user = app.DEFAULT_USER
+    assert client.post("/api/upload-data", data={"file": (io.BytesIO(data), "export.csv")}).status_code == 200
+    write_behind.flush()
+
+    # The summary misses the cache, then an upload of `data` lands while it waits for the user's slot
+    cached = app.upload_cache.latest(user)
+    app.upload_cache.invalidate(user)
+    load = dbReaders.load_activity_store
+
+    def upload_lands_first(*args, **kwargs):
+        app.upload_cache.put(user, digest, cached)
+        return load(*args, **kwargs)
+
+    monkeypatch.setattr(dbReaders, "load_activity_store", upload_lands_first)
+    resp = client.get("/api/summary")
+    assert resp.get_json()["source"] == "recomputed"
+
+    assert app.upload_cache.get(user, digest) is not None
+    assert client.get("/api/summary").get_json()["source"] == "cache"
+
+
+def test_trusted_header_mode_has_no_default_athlete(client, monkeypatch):
+    import app
+
+    monkeypatch.setattr(app, "TRUST_USER_HEADER", True)
+    assert client.get("/api/runs").status_code == 401
+    assert client.get("/api/runs", headers={"X-User-Id": "not-a-uuid"}).status_code == 401
+    user = "0b7a4f4e-5d1c-4c4e-9a55-2f8f5d0e6a11"
+    assert client.get("/api/runs", headers={"X-User-Id": user}).status_code == 200
+
+
+def test_default_athlete_ignores_the_header_when_untrusted(client, monkeypatch):
+    import app
+
+    monkeypatch.setattr(app, "TRUST_USER_HEADER", False)
+    with app.create_app().test_request_context(headers={"X-User-Id": "0b7a4f4e-5d1c-4c4e-9a55-2f8f5d0e6a11"}):
+        assert app.request_user() == app.DEFAULT_USER
+
+
+def test_cache_hit_reruns_an_upload_whose_writes_were_deferred(client, monkeypatch):
+    from dataPrep import write_behind
+
+    def db_down(frame, user, **options):
+        raise ConnectionError("db down")
+
+    data = strava_export_bytes(200)
+
+    def post():
+        return client.post("/api/upload-data", data={"file": (io.BytesIO(data), "export.csv")}).get_json()
+
+    monkeypatch.setattr(write_behind, "retries", 1)
+    with monkeypatch.context() as down:
+        down.setitem(write_behind.handlers, "RunData", db_down)
+        assert post()["cached"] is False
+        assert write_behind.flush(timeout=10)
+
+    # The earlier RunData write was deferred, so the same file is processed and queued again
+    retry = post()
+    assert retry["cached"] is False
+    assert retry["db_writes"]["RunData"]["status"] == "queued"
+    assert write_behind.flush(timeout=10)
+
+    assert post()["cached"] is True
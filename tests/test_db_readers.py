@@ -0,0 +1,54 @@
+import pandas as pd
+import pytest
+
+from dataPrep import write_rundata_to_db
+from dbReaders import fetch_runs, fetch_runs_page, load_activity_store, parse_bound
+from localDb import LocalClient
+from benchmarks.syntheticData import make_clean_runs
+
+USER = "reader"
+
+
+@pytest.fixture
+def client():
+    client = LocalClient()
+    write_rundata_to_db(make_clean_runs(250), USER, supabase=client, mode="replace")
+    return client
+
+
+def test_parse_bound_normalizes_to_the_stored_format():
+    assert parse_bound("2024-01-01") == "2024-01-01 00:00:00"
+    assert parse_bound("2024-01-01T02:00:00+02:00") == "2024-01-01 00:00:00"
+    assert parse_bound(None) is None and parse_bound("") is None
+    with pytest.raises(ValueError):
+        parse_bound("last tuesday-ish")
+
+
+def test_page_counts_only_when_asked(client):
+    rows, total = fetch_runs_page(USER, limit=10, supabase=client)
+    assert len(rows) == 10 and total is None
+
+    rows, total = fetch_runs_page(USER, limit=10, count=True, supabase=client)
+    assert len(rows) == 10 and total == 250
+
+
+def test_bounds_filter_start_date(client):
+    runs = fetch_runs(USER, page_size=100, supabase=client)
+    since, until = runs["start_date"].iloc[50], runs["start_date"].iloc[150]
+
+    window = fetch_runs(USER, since=since, until=until, page_size=100, supabase=client)
+    assert list(window["start_date"]) == list(runs["start_date"].iloc[50:150])
+
+
+def test_store_reads_offset_suffixed_dates(client):
+    # What PostgREST returns for a timestamptz column
+    for row in client.tables["RunData"]:
+        row["start_date"] = pd.Timestamp(row["start_date"]).tz_localize("+02:00").isoformat()
+
+    store = load_activity_store(USER, supabase=client)
+
+    assert len(store) == 250
+    dates = store["start_date"]
+    assert dates.dtype == "datetime64[ns]"
+    first = client.tables["RunData"][0]["start_date"]
+    assert dates.iloc[0] == pd.Timestamp(first).tz_convert("UTC").tz_localize(None)
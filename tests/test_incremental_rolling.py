@@ -0,0 +1,98 @@
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import vdot_ml_model.incrementalRollingFeatures as incremental
+from vdot_ml_model.incrementalRollingFeatures import IncrementalRollingFeatures, update_user_rolling_features
+from vdot_ml_model.buildRollingFeatures import build_rolling_features
+from benchmarks.syntheticData import make_clean_runs
+
+# Counts, extremes and dates come out exactly; sums and means differ from
+# pandas' compensated running totals by a few ULPs
+EXACT_PREFIXES = ("start_date", "run_count_", "longest_run_", "fastest_pace_", "max_hr_")
+
+
+def history(n=600, seed=4):
+    df = make_clean_runs(n, seed=seed)
+    df["start_date"] = pd.to_datetime(df["start_date"])
+    # Missing heart rate for a stretch of runs
+    df.loc[50:60, "average_heartrate"] = np.nan
+    df.loc[200, "max_heartrate"] = np.nan
+    # Runs sharing a timestamp, including one split across two appends
+    df.loc[100, "start_date"] = df.loc[99, "start_date"]
+    df.loc[300, "start_date"] = df.loc[299, "start_date"]
+    df.loc[301, "start_date"] = df.loc[299, "start_date"]
+    return df
+
+
+def assert_matches_batch(features, df):
+    expected = build_rolling_features(df)
+    features = features.reset_index(drop=True)
+
+    assert list(features.columns) == list(expected.columns)
+    assert len(features) == len(expected)
+    for col in expected.columns:
+        if col.startswith(EXACT_PREFIXES):
+            np.testing.assert_array_equal(features[col].to_numpy(), expected[col].to_numpy(), err_msg=col)
+        else:
+            np.testing.assert_allclose(features[col].to_numpy(dtype=float), expected[col].to_numpy(dtype=float),
+                                       rtol=1e-12, atol=0, err_msg=col)
+
+
+@pytest.mark.parametrize("cuts", [
+    [100, 101, 250, 300, 302],   # a duplicate timestamp straddles the 100/101 and 300/302 cuts
+    [1, 2, 3, 50, 61, 599],
+    [0],                         # everything appended to an empty engine
+])
+def test_appends_match_batch(cuts):
+    df = history()
+    engine = IncrementalRollingFeatures.from_history(df.iloc[:cuts[0]])
+    bounds = cuts + [len(df)]
+    for start, end in zip(bounds, bounds[1:]):
+        engine.append(df.iloc[start:end])
+
+    assert_matches_batch(engine.features(), df)
+
+
+def test_append_rejects_earlier_runs():
+    df = history()
+    engine = IncrementalRollingFeatures.from_history(df.iloc[:300])
+    with pytest.raises(ValueError):
+        engine.append(df.iloc[10:20])
+
+
+def test_user_updates_match_batch():
+    df = history()
+    for end in (200, 201, 450, len(df)):
+        features = update_user_rolling_features("parity-user", df.iloc[:end])
+    assert_matches_batch(features, df)
+
+    # An edited run is not an append; the rebuild still matches
+    edited = df.copy()
+    edited.loc[10, "distance_km"] += 1.0
+    assert_matches_batch(update_user_rolling_features("parity-user", edited), edited)
+
+
+def test_registry_is_thread_safe(monkeypatch):
+    monkeypatch.setattr(incremental, "ROLLING_STATE_MAX_USERS", 4)
+    df = history()
+    errors = []
+
+    def worker(offset):
+        try:
+            for i in range(40):
+                user = f"user-{(offset + i) % 12}"
+                update_user_rolling_features(user, df.iloc[:60 + (i % 60)])
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(t,)) for t in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    assert len(incremental._engines) <= 4
@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from dataPrep import write_rundata_to_db, upsert_in_batches
+from localDb import LocalClient
+from benchmarks.syntheticData import make_clean_runs
+
+N_RUNS = 3000
+
+
+@pytest.fixture
+def runs():
+    return make_clean_runs(N_RUNS)
+
+
+def reupload_of(df):
+    """The same export a week later: first run dropped, one run edited, five added."""
+    added = make_clean_runs(5, seed=1, start=df["start_date"].iloc[-1])
+    out = pd.concat([df.drop(index=[0]), added], ignore_index=True)
+    out.loc[len(out) // 2, "distance"] += 1.0
+    return out
+
+
+def stored_runs(client, user):
+    return sorted((r["start_date"], r["distance"]) for r in client.rows("RunData") if r["user"] == user)
+
+
+@pytest.mark.parametrize("mode", ["replace", "diff", "sync"])
+def test_first_upload_writes_every_run(runs, mode):
+    client = LocalClient()
+    user = f"first-{mode}"
+    summary = write_rundata_to_db(runs, user, supabase=client, mode=mode)
+
+    assert summary["written"] == N_RUNS
+    assert summary["failed"] == 0
+    assert summary.get("deleted", 0) == 0
+    assert len(stored_runs(client, user)) == N_RUNS
+
+
+@pytest.mark.parametrize("mode, written, deleted", [
+    ("replace", N_RUNS + 4, None),
+    ("diff", 6, 1),
+    ("sync", 6, 2),
+])
+def test_reupload_write_volume(runs, mode, written, deleted):
+    client = LocalClient()
+    user = f"reupload-{mode}"
+    write_rundata_to_db(runs, user, supabase=client, mode=mode)
+
+    reupload = reupload_of(runs)
+    summary = write_rundata_to_db(reupload, user, supabase=client, mode=mode)
+
+    assert summary["mode"] == mode
+    assert summary["written"] == written
+    assert summary["failed"] == 0
+    if deleted is not None:
+        assert summary["deleted"] == deleted
+
+    # Whatever the mode, the table ends up holding exactly the re-uploaded runs
+    reference = LocalClient()
+    write_rundata_to_db(reupload, user, supabase=reference, mode="replace")
+    assert stored_runs(client, user) == stored_runs(reference, user)
+
+
+def test_identical_reupload_writes_nothing(runs):
+    client = LocalClient()
+    write_rundata_to_db(runs, "same", supabase=client, mode="sync")
+    client.calls.clear()
+
+    summary = write_rundata_to_db(runs, "same", supabase=client, mode="sync")
+
+    assert (summary["written"], summary["deleted"], summary["batches"]) == (0, 0, 0)
+    assert summary["unchanged"] == N_RUNS
+
+
+def test_upsert_collapses_duplicate_keys_to_last():
+    client = LocalClient()
+    records = [
+        {"user": "u", "start_date": "2024-01-01 07:00:00", "distance": 5.0},
+        {"user": "u", "start_date": "2024-01-02 07:00:00", "distance": 8.0},
+        {"user": "u", "start_date": "2024-01-01 07:00:00", "distance": 6.0},
+    ]
+    summary = upsert_in_batches(client, "RunData", records, batch_size=10)
+
+    assert (summary["written"], summary["skipped"], summary["batches"]) == (2, 1, 1)
+    assert sorted(r["distance"] for r in client.rows("RunData")) == [6.0, 8.0]
+
+
+@pytest.mark.parametrize("n, batch_size, batches", [
+    (10, 5, 2),
+    (11, 5, 3),
+    (4, 5, 1),
+    (0, 5, 0),
+])
+def test_upsert_chunk_boundaries(n, batch_size, batches):
+    client = LocalClient()
+    records = [{"user": "u", "start_date": f"2024-01-{i + 1:02d} 07:00:00", "distance": float(i)} for i in range(n)]
+    summary = upsert_in_batches(client, "RunData", records, batch_size=batch_size)
+
+    assert summary["batches"] == batches
+    assert client.calls.get("RunData", 0) == batches
+    assert summary["written"] == n
+    assert len(client.rows("RunData")) == n
+
+
+@pytest.mark.parametrize("mode", ["replace", "diff", "sync"])
+def test_blank_metrics_are_sent_as_null(runs, mode):
+    # A treadmill run: no elevation, no average speed, no heart rate
+    runs.loc[10, ["total_elevation_gain", "average_speed", "average_heartrate"]] = np.nan
+    client = LocalClient()
+    summary = write_rundata_to_db(runs, f"treadmill-{mode}", supabase=client, mode=mode)
+
+    assert summary["failed"] == 0
+    assert summary["written"] == N_RUNS
+    blank = [r for r in client.rows("RunData") if r["total_elevation_gain"] is None]
+    assert len(blank) == 1
+    assert blank[0]["average_speed"] is None and blank[0]["average_heartrate"] is None
@@ -0,0 +1,27 @@
+from uploadJobs import UploadJobQueue, JOB_FAILED
+
+
+def fail():
+    raise RuntimeError("secret connection string")
+
+
+def test_failed_job_hides_the_exception(caplog):
+    jobs = UploadJobQueue(workers=1, max_pending=2)
+    job_id = jobs.submit(fail, owner="u")
+    jobs.shutdown()
+
+    job = jobs.get(job_id)
+    assert job["status"] == "failed"
+    assert job["error"] == JOB_FAILED
+    assert job["finished_at"] is not None
+    assert "secret connection string" in caplog.text
+
+
+def test_done_job_keeps_its_result():
+    jobs = UploadJobQueue(workers=1, max_pending=2)
+    job_id = jobs.submit(lambda x: x * 2, 21)
+    jobs.shutdown()
+
+    job = jobs.get(job_id)
+    assert (job["status"], job["result"], job["error"]) == ("done", 42, None)
+    assert jobs.pending() == 0
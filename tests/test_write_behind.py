@@ -0,0 +1,76 @@
+import threading
+
+import pandas as pd
+
+from writeBehind import WriteBehindWriter
+
+
+class FlakyHandler:
+    """Fails while `down` is set; blocks on `gate`; records each version written."""
+
+    def __init__(self):
+        self.down = True
+        self.gate = threading.Event()
+        self.gate.set()
+        self.started = threading.Event()
+        self.written = []
+
+    def __call__(self, frame, user):
+        self.started.set()
+        self.gate.wait()
+        if self.down:
+            raise ConnectionError("db down")
+        self.written.append(int(frame["version"].iloc[0]))
+        return {"failed": 0}
+
+
+def version(n):
+    return pd.DataFrame({"version": [n]})
+
+
+def test_spooled_write_survives_until_the_newer_one_lands(tmp_path):
+    handler = FlakyHandler()
+    writer = WriteBehindWriter({"RunData": handler}, retries=1, backoff=0, spool_dir=str(tmp_path), spool_retry=3600)
+    spool = tmp_path / "RunData-u.json"
+
+    writer.submit("RunData", "u", version(1))
+    assert writer.flush(timeout=5)
+    assert spool.exists()
+
+    # The newer write is in flight: a crash now must still leave version 1 to replay
+    handler.down = False
+    handler.gate.clear()
+    handler.started.clear()
+    writer.submit("RunData", "u", version(2))
+    assert handler.started.wait(5)
+    assert spool.exists()
+
+    handler.gate.set()
+    assert writer.flush(timeout=5)
+    assert not spool.exists()
+    assert writer.deferred() == 0
+
+    # Nothing stale is left for a replay to write over version 2
+    writer._replay_deferred()
+    assert writer.flush(timeout=5)
+    assert handler.written == [2]
+    writer.close(timeout=1)
+
+
+def test_close_spools_the_write_in_flight(tmp_path):
+    handler = FlakyHandler()
+    handler.down = False
+    handler.gate.clear()
+    writer = WriteBehindWriter({"RunData": handler}, retries=1, backoff=0, spool_dir=str(tmp_path), spool_retry=3600)
+    spool = tmp_path / "RunData-u.json"
+
+    writer.submit("RunData", "u", version(1))
+    assert handler.started.wait(5)
+    writer.close(timeout=0.1)
+    assert spool.exists()
+
+    # Landing after all removes the spooled copy
+    handler.gate.set()
+    writer._worker.join(5)
+    assert handler.written == [1]
+    assert not spool.exists()
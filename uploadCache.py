@@ -0,0 +1,79 @@
+"""
+Cache of upload responses, keyed on the user and a SHA-256 of the export.
+
+Re-uploading the export an athlete last uploaded returns the stored
+VDOT / avg HR / race-time response without running the pipeline or touching
+the database. Only each user's latest upload is kept: once a different
+export has been written, an older response no longer matches what is in the
+database, so it is dropped rather than served. With write-behind persistence a
+response is cached while its writes are still queued; app.py drops it on the
+next hit if the write queue reports those writes deferred or lost.
+
+Configuration (environment):
+    UPLOAD_CACHE_SIZE    users whose last response is kept (default 1024)
+    UPLOAD_CACHE_TTL     seconds a response stays valid (default 86400)
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+UPLOAD_CACHE_SIZE = int(os.getenv('UPLOAD_CACHE_SIZE', 1024))
+UPLOAD_CACHE_TTL = float(os.getenv('UPLOAD_CACHE_TTL', 86400))
+
+
+def file_digest(stream, chunk_size=1 << 20):
+    """SHA-256 of a seekable stream, read in chunks and rewound afterwards."""
+    h = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(chunk_size), b""):
+        h.update(chunk)
+    stream.seek(0)
+    return h.hexdigest()
+
+
+class UploadResultCache:
+
+    def __init__(self, maxsize=UPLOAD_CACHE_SIZE, ttl=UPLOAD_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # user -> (digest, response, stored_at)
+        self._lock = threading.Lock()
+
+    def get(self, user, digest):
+        with self._lock:
+            entry = self._entries.get(user)
+            if entry is not None and time.time() - entry[2] > self.ttl:
+                del self._entries[user]
+                entry = None
+            if entry is None or entry[0] != digest:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user)
+            self.hits += 1
+            return entry[1]
+
+    def latest(self, user):
+        """The user's last stored response whatever file it came from, or None."""
+        with self._lock:
+            entry = self._entries.get(user)
+            if entry is None or time.time() - entry[2] > self.ttl:
+                return None
+            return entry[1]
+
+    def put(self, user, digest, response):
+        with self._lock:
+            self._entries[user] = (digest, response, time.time())
+            self._entries.move_to_end(user)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user):
+        with self._lock:
+            self._entries.pop(user, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,116 @@
+"""
+Background job queue for uploads.
+
+Uploads are handed to a bounded thread pool so the request thread can return
+a job id immediately. `max_pending` caps queued plus running jobs; once it is
+reached `submit` raises QueueFull and the route answers 503 instead of letting
+a burst of uploads pile up in memory. A job can record an `owner` (the
+submitting user) for the routes to check before revealing its status.
+A failed job records the generic JOB_FAILED message; the traceback goes to
+the log rather than to whoever polls the job.
+
+Configuration (environment):
+    UPLOAD_WORKERS       concurrent pipeline runs (default 2)
+    UPLOAD_MAX_PENDING   queued + running jobs before rejecting (default 8)
+    UPLOAD_JOB_TTL       seconds a finished job stays pollable (default 3600)
+"""
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+UPLOAD_WORKERS = int(os.getenv('UPLOAD_WORKERS', 2))
+UPLOAD_MAX_PENDING = int(os.getenv('UPLOAD_MAX_PENDING', 8))
+UPLOAD_JOB_TTL = float(os.getenv('UPLOAD_JOB_TTL', 3600))
+
+JOB_FAILED = "Upload processing failed"
+
+logger = logging.getLogger("stryde.jobs")
+
+
+class QueueFull(Exception):
+    pass
+
+
+class UploadJobQueue:
+
+    def __init__(self, workers=UPLOAD_WORKERS, max_pending=UPLOAD_MAX_PENDING, job_ttl=UPLOAD_JOB_TTL):
+        self.max_pending = max_pending
+        self.job_ttl = job_ttl
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="upload")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, owner=None, **kwargs):
+        """Queue `fn(*args, **kwargs)` and return its job id, or raise QueueFull."""
+        if not self._slots.acquire(blocking=False):
+            raise QueueFull(f"{self.max_pending} uploads already pending")
+
+        job_id = uuid.uuid4().hex
+        job = {
+            "id": job_id,
+            "owner": owner,
+            "status": "queued",
+            "submitted_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None,
+        }
+        with self._lock:
+            self._prune()
+            self._jobs[job_id] = job
+
+        try:
+            self._executor.submit(self._run, job, fn, args, kwargs)
+        except Exception:
+            self._slots.release()
+            with self._lock:
+                self._jobs.pop(job_id, None)
+            raise
+        return job_id
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def pending(self):
+        with self._lock:
+            return sum(1 for j in self._jobs.values() if j["status"] in ("queued", "running"))
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+    def _run(self, job, fn, args, kwargs):
+        # get() copies the job under the lock, so every update takes it too
+        with self._lock:
+            job["status"] = "running"
+            job["started_at"] = time.time()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            logger.exception("Upload job %s failed", job["id"])
+            with self._lock:
+                job["error"] = JOB_FAILED
+                job["status"] = "failed"
+                job["finished_at"] = time.time()
+        else:
+            with self._lock:
+                job["result"] = result
+                job["status"] = "done"
+                job["finished_at"] = time.time()
+        finally:
+            self._slots.release()
+
+    def _prune(self):
+        cutoff = time.time() - self.job_ttl
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job["finished_at"] is not None and job["finished_at"] < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
@@ -1,4 +1,7 @@
 const API_BASE_URL = 'http://localhost:5000/api';
+// Only sent if a login flow has stored it, and only honoured behind a trusted
+// proxy (STRYDE_TRUST_USER_HEADER); otherwise the API uses its default athlete
+const USER_ID = localStorage.getItem('strydeUserId');
 
 const profileButton = document.getElementById('profileButton');
 const profileMenu = document.getElementById('profileMenu');
@@ -8,6 +11,7 @@ const uploadHeader = document.getElementById('uploadHeader');
 const uploadArea = document.getElementById('uploadArea');
 const uploadInput = document.getElementById('uploadInput');
 const loadingState = document.getElementById('loadingState');
+const loadingMessage = document.getElementById('loadingMessage');
 const errorMessage = document.getElementById('errorMessage');
 
 profileButton.addEventListener('click', () => {
@@ -39,6 +43,7 @@ function resetUploadModal() {
     uploadInput.value = '';
     errorMessage.classList.remove('show');
     loadingState.classList.remove('show');
+    loadingMessage.textContent = 'This may take a few moments';
     uploadArea.style.display = 'block';
 }
 
@@ -81,18 +86,20 @@ function uploadData(file) {
     uploadHeader.textContent = 'Processing Your Data';
     errorMessage.classList.remove('show');
 
-    fetch(`${API_BASE_URL}/upload-data`, {
+    // Progress arrives as server-sent events: stage updates, the prediction
+    // as soon as it is known, then "done" once the database writes finish.
+    fetch(`${API_BASE_URL}/upload-data/stream`, {
         method: 'POST',
+        headers: USER_ID ? { 'X-User-Id': USER_ID } : {},
         body: formData
     })
-    .then(response => response.json())
-    .then(result => {
-        if (result.error) {
-            showError('Error: ' + result.error);
-        } else {
-            displayResults(result);
-            closeUploadModal();
+    .then(response => {
+        if (!response.ok || !response.body) {
+            return response.json().then(result => {
+                throw new Error(result.error || response.statusText);
+            });
         }
+        return readEvents(response.body, handleUploadEvent);
     })
     .catch(error => {
         showError('Upload failed: ' + error.message);
@@ -102,6 +109,65 @@ function uploadData(file) {
     });
 }
 
+const STAGE_MESSAGES = {
+    clean: 'Cleaned {rows} runs',
+    rolling: 'Built training load for {rows} runs',
+    label: 'Found {rows} race efforts',
+    rundata_write: 'Saved {rows} new runs',
+    recent_activity_write: 'Saved recent activity',
+    persist_enqueue: 'Saving your runs in the background',
+};
+
+function handleUploadEvent(event, data) {
+    if (event === 'stage') {
+        const message = STAGE_MESSAGES[data.stage];
+        if (message) {
+            loadingMessage.textContent = message.replace('{rows}', data.rows_out);
+        }
+    } else if (event === 'prediction') {
+        displayResults(data);
+        loadingMessage.textContent = 'Predictions ready, saving your runs';
+    } else if (event === 'done') {
+        displayResults(data);
+        closeUploadModal();
+    } else if (event === 'error') {
+        throw new Error(data.error);
+    }
+}
+
+async function readEvents(body, onEvent) {
+    const reader = body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) {
+            break;
+        }
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const block = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            let event = 'message';
+            let data = '';
+            for (const line of block.split('\n')) {
+                if (line.startsWith('event: ')) {
+                    event = line.slice(7);
+                } else if (line.startsWith('data: ')) {
+                    data += line.slice(6);
+                }
+            }
+            if (data) {
+                onEvent(event, JSON.parse(data));
+            }
+        }
+    }
+}
+
 function displayResults(result) {
     document.getElementById('vdot-value').textContent = parseFloat(result.vdot).toFixed(2);
     document.getElementById('hr-value').textContent = Math.round(result.avg_hr) + ' BPM';
@@ -0,0 +1,146 @@
+"""
+Compact, typed in-memory representation of one athlete's cleaned runs.
+
+clean_strava_csv returns a general float64 frame with string dates and three
+copies of the distance. ActivityStore keeps a single columnar frame sorted by
+start_date with datetime64 timestamps, float32 metrics and a categorical
+`type`, about half the memory, and computes the other units on demand.
+
+Pipeline stages accept a store wherever they take a runs frame. Dates are
+never re-parsed, and a stage only materialises the columns it computes on,
+widened back to float64 (`widen`) so results match the float64 pipeline.
+"""
+import numpy as np
+import pandas as pd
+
+# Stored columns and their dtypes, in order
+STORE_DTYPES = {
+    "start_date": "datetime64[ns]",
+    "type": "category",
+    "distance_km": "float32",
+    "moving_time": "float32",
+    "elapsed_time": "float32",
+    "average_speed": "float32",
+    "average_heartrate": "float32",
+    "max_heartrate": "float32",
+    "total_elevation_gain": "float32",
+}
+
+MILES_PER_KM = 0.621371
+
+# Columns derived from the stored ones when asked for
+DERIVED_COLUMNS = {
+    "distance": lambda f: f["distance_km"].astype(float),
+    "distance_miles": lambda f: f["distance_km"].astype(float) * MILES_PER_KM,
+    "pace_sec_per_km": lambda f: f["moving_time"].astype(float) / f["distance_km"].astype(float).replace({0: np.nan}),
+    "pace_sec_per_mile": lambda f: f["moving_time"].astype(float) / (f["distance_km"].astype(float) * MILES_PER_KM).replace({0: np.nan}),
+}
+
+
+def widen(values) -> np.ndarray:
+    """
+    float32 -> float64 keeping the shortest decimal (6 to 9 significant
+    digits) that rounds back to the same float32, so 5.03 stays 5.03 rather
+    than becoming 5.0300000191. Other dtypes are just cast to float64.
+    """
+    values = np.asarray(values)
+    if values.dtype != np.float32:
+        return values.astype(float)
+
+    wide = values.astype(float)
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        magnitude = np.floor(np.log10(np.abs(wide)))
+        out = wide.copy()
+        done = ~np.isfinite(magnitude)  # zero, NaN and inf are already exact
+        for digits in (6, 7, 8, 9):
+            scale = 10.0 ** (digits - 1 - magnitude)
+            candidate = np.round(wide * scale) / scale
+            ok = ~done & (candidate.astype(np.float32) == values)
+            out[ok] = candidate[ok]
+            done |= ok
+    return out
+
+
+class ActivityStore:
+
+    def __init__(self, frame: pd.DataFrame):
+        """Wrap a frame already in store layout; use from_frame to convert one."""
+        self.frame = frame
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, date_format=None):
+        """
+        Convert a cleaned runs frame (string or datetime start_date, float64
+        metrics, optional `distance` instead of `distance_km`). Offset-suffixed
+        or tz-aware start dates are stored as naive UTC.
+        """
+        if "distance_km" not in df.columns:
+            df = df.rename(columns={"distance": "distance_km"})
+
+        columns = {}
+        for name, dtype in STORE_DTYPES.items():
+            col = df[name] if name in df.columns else pd.Series(np.nan, index=df.index)
+            if name == "start_date":
+                if not pd.api.types.is_datetime64_any_dtype(col):
+                    # Supabase returns timestamptz text with an offset ('...+00:00')
+                    col = pd.to_datetime(col, format=date_format, errors="coerce", utc=True)
+                if isinstance(col.dtype, pd.DatetimeTZDtype):
+                    col = col.dt.tz_convert(None)
+                col = col.astype("datetime64[ns]")
+            elif name == "type":
+                col = col.fillna("Run").astype(str).astype("category")
+            else:
+                col = col.astype(dtype)
+            columns[name] = col.reset_index(drop=True)
+
+        frame = pd.DataFrame(columns)
+        if not frame["start_date"].is_monotonic_increasing:
+            frame = frame.sort_values("start_date", kind="mergesort").reset_index(drop=True)
+        return cls(frame)
+
+    def __len__(self):
+        return len(self.frame)
+
+    @property
+    def empty(self):
+        return self.frame.empty
+
+    @property
+    def columns(self):
+        return list(self.frame.columns) + list(DERIVED_COLUMNS)
+
+    def __getitem__(self, name) -> pd.Series:
+        return _column(self.frame, name)
+
+    def to_frame(self, columns=None, wide=False) -> pd.DataFrame:
+        """
+        A new frame with `columns` (stored or derived; default: the layout
+        clean_strava_csv produces). wide=True widens float32 columns with
+        `widen` before deriving anything, for output that leaves the process.
+        """
+        if columns is None:
+            columns = ["distance", "moving_time", "elapsed_time", "average_speed", "average_heartrate",
+                       "max_heartrate", "total_elevation_gain", "type", "start_date", "distance_km", "distance_miles"]
+        base = self.frame
+        if wide:
+            base = base.assign(**{
+                name: widen(base[name].to_numpy()) for name, dtype in STORE_DTYPES.items() if dtype == "float32"
+            })
+        return pd.DataFrame({name: _column(base, name) for name in columns})
+
+    def memory_usage(self) -> int:
+        """Bytes held by the stored columns."""
+        return int(self.frame.memory_usage(index=True, deep=True).sum())
+
+
+def _column(frame, name) -> pd.Series:
+    if name in frame.columns:
+        return frame[name]
+    if name in DERIVED_COLUMNS:
+        return DERIVED_COLUMNS[name](frame).rename(name)
+    raise KeyError(name)
+
+
+def as_runs_frame(runs) -> pd.DataFrame:
+    """The underlying frame of an ActivityStore, or `runs` itself if it is already a frame."""
+    return runs.frame if isinstance(runs, ActivityStore) else runs
@@ -1,20 +1,48 @@
 import pandas as pd
 import numpy as np
+import logging
 
-# Change to pull from database instead of csv
-def build_rolling_features(df: pd.DataFrame, windows=(14, 30)) -> pd.DataFrame:
+from vdot_ml_model.rollingKernel import rolling_aggregates
+from vdot_ml_model.activityStore import ActivityStore
 
-    df = df.copy()
-    df = df.sort_values("start_date").reset_index(drop=True)
+logger = logging.getLogger("stryde.pipeline")
 
-    df["distance_km"] = df["distance_km"].astype(float)
+def build_rolling_features(df: pd.DataFrame, windows=(14, 30), engine="pandas") -> pd.DataFrame:
+    """
+    Rolling training-load features for each run over the preceding windows.
 
-    # Add a miles column for convenience (1 km = 0.621371 miles)
-    df["distance_miles"] = df["distance_km"] * 0.621371
-    # Avoid division by zero if distance is zero
-    df["pace_sec_per_km"] = df["moving_time"] / df["distance_km"].replace({0: np.nan})
-    # seconds per mile (useful for some features or display)
-    df["pace_sec_per_mile"] = df["moving_time"] / df["distance_miles"].replace({0: np.nan})
+    engine="pandas" builds one pandas rolling window per window size;
+    engine="kernel" computes every window and statistic in a single sorted
+    pass (see rollingKernel) and gives the same result up to float rounding.
+
+    `df` may be an ActivityStore, which is already sorted: only the columns
+    the features need are materialised (widened to float64), with the derived
+    units computed once.
+    """
+
+    if isinstance(df, ActivityStore):
+        df = df.to_frame(["start_date", "distance_km", "distance_miles", "pace_sec_per_km", "pace_sec_per_mile",
+                          "average_heartrate", "max_heartrate", "total_elevation_gain"], wide=True)
+    else:
+        df = df.copy()
+        df = df.sort_values("start_date").reset_index(drop=True)
+
+        df["distance_km"] = df["distance_km"].astype(float)
+
+        # Add a miles column for convenience (1 km = 0.621371 miles)
+        df["distance_miles"] = df["distance_km"] * 0.621371
+        # Avoid division by zero if distance is zero
+        df["pace_sec_per_km"] = df["moving_time"] / df["distance_km"].replace({0: np.nan})
+        # seconds per mile (useful for some features or display)
+        df["pace_sec_per_mile"] = df["moving_time"] / df["distance_miles"].replace({0: np.nan})
+
+    if engine == "kernel":
+        feature_df = rolling_aggregates(df, windows=windows)
+        final_df = pd.concat([df[["start_date"]], feature_df], axis=1)
+        final_df = final_df.dropna().reset_index(drop=True)
+
+        logger.debug("Rolling features built: %d rows", len(final_df))
+        return final_df
 
     feature_frames = []
 
@@ -49,5 +77,5 @@ def build_rolling_features(df: pd.DataFrame, windows=(14, 30)) -> pd.DataFrame:
     # send data to csv
     #final_df.to_csv("vdot_ml_model/rolling_features.csv", index=False)
 
-    print("Rolling features built.")
+    logger.debug("Rolling features built: %d rows", len(final_df))
     return final_df
\ No newline at end of file
@@ -1,23 +1,77 @@
 import pandas as pd
+import logging
 import os
-from supabase import create_client, Client
-
-def clean_strava_csv(input_csv_path: str) -> None:
-    df = pd.read_csv(input_csv_path)
-    df.columns = df.columns.str.strip()
-
-    # Column mapping
-    column_map = {
-        "Distance": "distance",
-        "Moving Time": "moving_time",
-        "Elapsed Time": "elapsed_time",
-        "Average Speed": "average_speed",
-        "Average Heart Rate": "average_heartrate",
-        "Max Heart Rate": "max_heartrate",
-        "Elevation Gain": "total_elevation_gain",
-        "Activity Type": "type",
-        "Activity Date": "start_date",
-    }
+
+from vdot_ml_model.frameIO import write_frame
+from vdot_ml_model.activityStore import ActivityStore
+
+logger = logging.getLogger("stryde.pipeline")
+
+# Column mapping
+COLUMN_MAP = {
+    "Distance": "distance",
+    "Moving Time": "moving_time",
+    "Elapsed Time": "elapsed_time",
+    "Average Speed": "average_speed",
+    "Average Heart Rate": "average_heartrate",
+    "Max Heart Rate": "max_heartrate",
+    "Elevation Gain": "total_elevation_gain",
+    "Activity Type": "type",
+    "Activity Date": "start_date",
+}
+
+# Explicit dtypes for the streaming reader so pandas skips type inference
+INGEST_DTYPES = {
+    "Distance": "float64",
+    "Moving Time": "float64",
+    "Elapsed Time": "float64",
+    "Average Speed": "float64",
+    "Average Heart Rate": "float64",
+    "Max Heart Rate": "float64",
+    "Elevation Gain": "float64",
+    "Activity Type": "str",
+    "Activity Date": "str",
+}
+
+# Rows per chunk when streaming an export; 0 reads the whole file at once
+INGEST_CHUNKSIZE = int(os.getenv('INGEST_CHUNKSIZE', 5000))
+
+def read_strava_runs(input_csv, chunksize=INGEST_CHUNKSIZE) -> pd.DataFrame:
+    """
+    Stream a Strava export in chunks, keeping only the mapped columns and
+    only Run activities from each chunk, so peak memory tracks the number of
+    runs rather than the width and length of the whole export.
+
+    Strava repeats some headers (e.g. "Distance"); like the full read, only
+    the first occurrence is kept.
+    """
+    reader = pd.read_csv(
+        input_csv,
+        usecols=lambda c: c.strip() in COLUMN_MAP,
+        dtype=INGEST_DTYPES,
+        chunksize=chunksize,
+    )
+
+    runs = []
+    for chunk in reader:
+        chunk.columns = chunk.columns.str.strip()
+        if "Activity Type" in chunk.columns:
+            chunk = chunk[chunk["Activity Type"].str.lower() == "run"]
+        runs.append(chunk)
+
+    if not runs:
+        return pd.DataFrame(columns=list(COLUMN_MAP))
+    return pd.concat(runs, ignore_index=True)
+
+def _clean_runs(input_csv_path, chunksize=None) -> pd.DataFrame:
+    """Mapped, filtered runs with start_date parsed to datetimes."""
+    if chunksize:
+        df = read_strava_runs(input_csv_path, chunksize=chunksize)
+    else:
+        df = pd.read_csv(input_csv_path)
+        df.columns = df.columns.str.strip()
+
+    column_map = COLUMN_MAP
 
     available_columns = {
         k: v for k, v in column_map.items() if k in df.columns
@@ -34,15 +88,31 @@ def clean_strava_csv(input_csv_path: str) -> None:
     )
 
     df = df.dropna(subset=["distance", "moving_time"])
-    df = df.reset_index(drop=True)
+    return df.reset_index(drop=True)
+
+def clean_strava_csv(input_csv_path: str, chunksize=None, output_path=None) -> None:
+    df = _clean_runs(input_csv_path, chunksize=chunksize)
 
     df["distance"] = df["distance"].astype(float)
     df["start_date"] = df["start_date"].dt.strftime('%Y-%m-%d %H:%M:%S')
     df["distance_km"] = df["distance"].copy()
     df["distance_miles"] = df["distance_km"] * 0.621371
 
-    df.to_csv("vdot_ml_model/clean_activities.csv", index=False)
-    #print(f"✅ Cleaned Strava CSV saved to: {output_csv_path}")
+    if output_path:
+        write_frame(df, output_path)
+
+    logger.debug("Input cleaned: %d runs", len(df))
+    return df
+
+def clean_strava_activities(input_csv_path, chunksize=None, output_path=None) -> ActivityStore:
+    """
+    Same cleaning as clean_strava_csv, but returns a compact ActivityStore
+    with start_date kept as datetimes, so later stages never re-parse it.
+    """
+    store = ActivityStore.from_frame(_clean_runs(input_csv_path, chunksize=chunksize))
+
+    if output_path:
+        write_frame(store.to_frame(wide=True), output_path)
 
-    print("Input cleaned.")
-    return df
\ No newline at end of file
+    logger.debug("Input cleaned: %d runs", len(store))
+    return store
@@ -0,0 +1,61 @@
+"""
+In-memory hand-off between pipeline stages, with optional persistence.
+
+Stages pass DataFrames to each other directly. Writing a stage's output to
+disk is opt-in: set ARTIFACT_DIR (or pass a directory) and frames are saved
+under <dir>/<user>/<job>/ so concurrent uploads never share a file.
+Parquet and Feather need pyarrow; CSV works everywhere.
+"""
+import os
+import uuid
+
+import pandas as pd
+
+from vdot_ml_model.activityStore import ActivityStore
+
+ARTIFACT_DIR = os.getenv('ARTIFACT_DIR')
+ARTIFACT_FORMAT = os.getenv('ARTIFACT_FORMAT', 'parquet')
+
+
+def load_frame(source, date_column="start_date") -> pd.DataFrame:
+    """
+    Accept a DataFrame, an ActivityStore (returned as a widened float64 copy)
+    or a path to a .csv/.parquet/.feather file and return a frame with
+    `date_column` as datetimes. Frames passed in are not mutated.
+    """
+    if isinstance(source, ActivityStore):
+        df = source.to_frame(wide=True)
+    elif isinstance(source, pd.DataFrame):
+        df = source
+    else:
+        path = str(source)
+        if path.endswith(".parquet"):
+            df = pd.read_parquet(path)
+        elif path.endswith(".feather"):
+            df = pd.read_feather(path)
+        else:
+            df = pd.read_csv(path)
+
+    if date_column in df.columns and not pd.api.types.is_datetime64_any_dtype(df[date_column]):
+        df = df.assign(**{date_column: pd.to_datetime(df[date_column])})
+    return df
+
+
+def write_frame(df: pd.DataFrame, path) -> str:
+    """Write `df` in the format given by the file extension, creating parent dirs."""
+    path = str(path)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if path.endswith(".parquet"):
+        df.to_parquet(path, index=False)
+    elif path.endswith(".feather"):
+        df.reset_index(drop=True).to_feather(path)
+    else:
+        df.to_csv(path, index=False)
+    return path
+
+
+def artifact_path(name, user, job_id=None, fmt=ARTIFACT_FORMAT, root=ARTIFACT_DIR):
+    """Per-user, per-job location for a stage's output, or None when persistence is off."""
+    if not root:
+        return None
+    return os.path.join(root, str(user), job_id or uuid.uuid4().hex, f"{name}.{fmt}")
@@ -0,0 +1,292 @@
+import os
+import threading
+from collections import OrderedDict, deque
+
+import numpy as np
+import pandas as pd
+
+from vdot_ml_model.buildRollingFeatures import build_rolling_features
+from vdot_ml_model.rollingKernel import FEATURE_SPECS, INPUT_COLUMNS
+from vdot_ml_model.activityStore import ActivityStore
+
+# Users whose window state is kept in memory; least recently updated are dropped first
+ROLLING_STATE_MAX_USERS = int(os.getenv('ROLLING_STATE_MAX_USERS', 256))
+
+# Columns that identify a run for the purposes of the history fingerprint
+FINGERPRINT_COLUMNS = ["start_date", "distance_km", "moving_time", "average_heartrate",
+                       "max_heartrate", "total_elevation_gain"]
+
+
+class _RunningSum:
+    """Compensated (Kahan) sum that supports removal, like pandas' rolling sum."""
+
+    def __init__(self):
+        self.total = 0.0
+        self.comp = 0.0
+        self.nobs = 0
+
+    def add(self, x):
+        if x != x:
+            return
+        self.nobs += 1
+        y = x - self.comp
+        t = self.total + y
+        self.comp = (t - self.total) - y
+        self.total = t
+
+    def remove(self, x):
+        if x != x:
+            return
+        self.nobs -= 1
+        if self.nobs == 0:
+            self.total = 0.0
+            self.comp = 0.0
+            return
+        y = -x - self.comp
+        t = self.total + y
+        self.comp = (t - self.total) - y
+        self.total = t
+
+
+class _MonotonicExtreme:
+    """Sliding max (or min) over sequence-numbered values using a monotonic deque."""
+
+    def __init__(self, is_max):
+        self.is_max = is_max
+        self.items = deque()
+
+    def push(self, seq, x):
+        if x != x:
+            return
+        items = self.items
+        if self.is_max:
+            while items and items[-1][1] <= x:
+                items.pop()
+        else:
+            while items and items[-1][1] >= x:
+                items.pop()
+        items.append((seq, x))
+
+    def evict_before(self, seq):
+        while self.items and self.items[0][0] < seq:
+            self.items.popleft()
+
+    def value(self):
+        return self.items[0][1] if self.items else np.nan
+
+
+class _WindowState:
+    """Rows inside one [t - window, t) window plus its running aggregates."""
+
+    def __init__(self, window_days):
+        self.span = pd.Timedelta(days=window_days).value
+        self.rows = deque()  # (seq, ts, values)
+        self.sums = {col: _RunningSum() for col in INPUT_COLUMNS}
+        self.extremes = {
+            (col, stat): _MonotonicExtreme(stat == "max")
+            for _, col, stat in FEATURE_SPECS if stat in ("max", "min")
+        }
+
+    def admit(self, seq, ts, values):
+        self.rows.append((seq, ts, values))
+        for col, x in values.items():
+            self.sums[col].add(x)
+        for (col, _), extreme in self.extremes.items():
+            extreme.push(seq, values[col])
+
+    def evict_until(self, ts):
+        cutoff = ts - self.span
+        while self.rows and self.rows[0][1] < cutoff:
+            _, _, values = self.rows.popleft()
+            for col, x in values.items():
+                self.sums[col].remove(x)
+        first_seq = self.rows[0][0] if self.rows else np.inf
+        for extreme in self.extremes.values():
+            extreme.evict_before(first_seq)
+
+    def features(self):
+        out = []
+        for _, col, stat in FEATURE_SPECS:
+            running = self.sums[col]
+            if stat in ("max", "min"):
+                out.append(self.extremes[(col, stat)].value())
+            elif running.nobs == 0:
+                out.append(np.nan)
+            elif stat == "sum":
+                out.append(running.total)
+            elif stat == "count":
+                out.append(float(running.nobs))
+            else:
+                out.append(running.total / running.nobs)
+        return out
+
+
+def prepare_runs(df: pd.DataFrame) -> pd.DataFrame:
+    """Derive the same unit and pace columns build_rolling_features works from."""
+    df = df.sort_values("start_date", kind="mergesort").reset_index(drop=True)
+    distance_km = df["distance_km"].astype(float)
+    distance_miles = distance_km * 0.621371
+    return pd.DataFrame({
+        "start_date": df["start_date"],
+        "distance_km": distance_km,
+        "distance_miles": distance_miles,
+        "pace_sec_per_km": df["moving_time"] / distance_km.replace({0: np.nan}),
+        "pace_sec_per_mile": df["moving_time"] / distance_miles.replace({0: np.nan}),
+        "average_heartrate": df["average_heartrate"],
+        "max_heartrate": df["max_heartrate"],
+        "total_elevation_gain": df["total_elevation_gain"],
+    })
+
+
+def fingerprint(df: pd.DataFrame) -> int:
+    """Order-independent hash of a run history (sum of per-row hashes, mod 2**64)."""
+    if df.empty:
+        return 0
+    return int(pd.util.hash_pandas_object(df[FINGERPRINT_COLUMNS], index=False).sum())
+
+
+class IncrementalRollingFeatures:
+    """
+    Rolling 14/30-day features that can be extended with newly appended runs.
+
+    Per-window state (the rows currently in each window, compensated running
+    sums and monotonic-deque min/max) is carried between calls, so appending
+    k runs costs O(k) rather than a recompute over the whole history.
+
+    Output has the same rows, dates, run counts and min/max features as
+    build_rolling_features. Sums and means agree to a few ULPs but are not
+    bit-identical: pandas' compensated running totals depend on every add and
+    remove since the start of the history, while this state is seeded from
+    the runs still in a window.
+    """
+
+    def __init__(self, windows=(14, 30)):
+        self.windows = tuple(windows)
+        self.n_runs = 0
+        self.fingerprint = 0
+        self._states = [_WindowState(w) for w in self.windows]
+        self._staged = []  # runs at the latest timestamp; a window never includes its own timestamp
+        self._last_ts = None
+        self._seq = 0
+        self._frame = pd.DataFrame(columns=self.columns())
+
+    def columns(self):
+        return ["start_date"] + [f"{prefix}_{w}d" for w in self.windows for prefix, _, _ in FEATURE_SPECS]
+
+    @classmethod
+    def from_history(cls, df: pd.DataFrame, windows=(14, 30)):
+        """
+        Build features for a full history with the batch function, then seed
+        the window state from only the runs that can still fall inside a window.
+        """
+        engine = cls(windows)
+        if df.empty:
+            return engine
+
+        runs = prepare_runs(df)
+        engine._frame = build_rolling_features(df, windows=engine.windows)
+
+        last_ts = runs["start_date"].iloc[-1].value
+        horizon = last_ts - pd.Timedelta(days=max(engine.windows)).value
+        tail = runs[runs["start_date"].astype("datetime64[ns]").astype("int64") >= horizon]
+        engine._advance(tail, emit=False)
+
+        engine.n_runs = len(df)
+        engine.fingerprint = fingerprint(df)
+        return engine
+
+    def append(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Add runs no earlier than the latest one seen; returns their feature rows."""
+        if df.empty:
+            return self._frame.iloc[0:0]
+
+        runs = prepare_runs(df)
+        if self._last_ts is not None and runs["start_date"].iloc[0].value < self._last_ts:
+            raise ValueError("Appended runs predate the existing history; rebuild with from_history")
+
+        new_rows = self._advance(runs, emit=True)
+        new_frame = pd.DataFrame(new_rows, columns=self.columns()).dropna()
+        if self._frame.empty:
+            self._frame = new_frame.reset_index(drop=True)
+        elif not new_frame.empty:
+            self._frame = pd.concat([self._frame, new_frame], ignore_index=True)
+
+        self.n_runs += len(df)
+        self.fingerprint = (self.fingerprint + fingerprint(df)) % (1 << 64)
+        return new_frame.reset_index(drop=True)
+
+    def features(self) -> pd.DataFrame:
+        return self._frame
+
+    def _advance(self, runs: pd.DataFrame, emit):
+        timestamps = runs["start_date"]
+        ts_values = timestamps.astype("datetime64[ns]").astype("int64").to_numpy()
+        columns = {col: runs[col].to_numpy(dtype=float) for col in INPUT_COLUMNS}
+
+        rows = []
+        for i in range(len(runs)):
+            ts = int(ts_values[i])
+
+            if self._last_ts is not None and ts > self._last_ts:
+                for seq, staged_ts, values in self._staged:
+                    for state in self._states:
+                        state.admit(seq, staged_ts, values)
+                self._staged = []
+
+            if emit:
+                row = [timestamps.iloc[i]]
+                for state in self._states:
+                    state.evict_until(ts)
+                    row.extend(state.features())
+                rows.append(row)
+
+            self._staged.append((self._seq, ts, {col: columns[col][i] for col in INPUT_COLUMNS}))
+            self._seq += 1
+            self._last_ts = ts
+
+        if not emit:
+            for state in self._states:
+                state.evict_until(self._last_ts)
+        return rows
+
+
+_engines = OrderedDict()
+_engines_lock = threading.Lock()
+
+
+def update_user_rolling_features(user, df: pd.DataFrame, windows=(14, 30)) -> pd.DataFrame:
+    """
+    Rolling features for a user's full history, reusing their cached window
+    state when the history only gained newer runs since the last call.
+
+    The runs already seen are recognised by count and fingerprint; anything
+    else (edits, deletions, back-filled runs) falls back to a batch rebuild.
+    An ActivityStore is already sorted; only the columns used here are materialised.
+
+    The user's engine is taken out of the registry while it is being
+    extended, so two concurrent calls for one user never share it: the second
+    finds none and rebuilds from the batch function instead.
+    """
+    if isinstance(df, ActivityStore):
+        runs = df.to_frame(FINGERPRINT_COLUMNS, wide=True)
+    else:
+        runs = df.sort_values("start_date", kind="mergesort").reset_index(drop=True)
+    with _engines_lock:
+        engine = _engines.pop(user, None)
+
+    if (
+        engine is not None
+        and engine.windows == tuple(windows)
+        and engine.n_runs <= len(runs)
+        and fingerprint(runs.iloc[:engine.n_runs]) == engine.fingerprint
+    ):
+        engine.append(runs.iloc[engine.n_runs:])
+    else:
+        engine = IncrementalRollingFeatures.from_history(runs, windows=windows)
+
+    with _engines_lock:
+        _engines[user] = engine
+        while len(_engines) > ROLLING_STATE_MAX_USERS:
+            _engines.popitem(last=False)
+
+    return engine.features()
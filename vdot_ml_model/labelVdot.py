@@ -1,35 +1,94 @@
 import pandas as pd
 import numpy as np
+import logging
 
+from vdot_ml_model.frameIO import write_frame
+from vdot_ml_model.activityStore import as_runs_frame, widen
+from vdot_ml_model.danielsFormula import vdot_from_race
 
-def calculate_vdot(distance_m: float, time_sec: float) -> float:
-    t = time_sec / 60  # minutes
-    v = distance_m / t  # meters per minute
+logger = logging.getLogger("stryde.pipeline")
 
-    vo2 = -4.60 + 0.182258 * v + 0.000104 * (v ** 2)
-    percent_vo2max = (0.8 + 0.1894393 * np.exp(-0.012778 * t) + 0.2989558 * np.exp(-0.1932605 * t))
 
-    return vo2 / percent_vo2max
+def calculate_vdot(distance_m: float, time_sec: float) -> float:
+    return vdot_from_race(distance_m, time_sec)
 
 
 def find_race_like_efforts(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
-
-    df["distance_miles"] = df["distance_km"] * 0.621371
-    df["stoppage_ratio"] = df["moving_time"] / df["elapsed_time"]
+    # The criteria are evaluated on the side so only the matching rows are copied
+    distance_miles = df["distance_km"].astype(float) * 0.621371
+    stoppage_ratio = df["moving_time"].astype(float) / df["elapsed_time"].astype(float)
 
     return df[
         (df["average_heartrate"] >= 160) &
-        (df["distance_miles"] >= 3.0) &
-        (df["stoppage_ratio"] >= 0.97) # Stopped no more than 3% of the time
+        (distance_miles >= 3.0) &
+        (stoppage_ratio >= 0.97) # Stopped no more than 3% of the time
     ]
 
-def label_rolling_features(runs_df: pd.DataFrame, rolling_df: pd.DataFrame, output_csv: str) -> None:
+def thin_races(dates: np.ndarray, min_gap=np.timedelta64(21, "D")) -> np.ndarray:
+    """
+    Positions of races kept when only one race per `min_gap` is allowed.
+
+    `dates` must be sorted. Each kept race jumps straight to the first race at
+    least `min_gap` later via searchsorted, so this is one pass over the
+    timestamps rather than a row-by-row comparison.
+    """
+    keep = []
+    i = 0
+    n = len(dates)
+    while i < n:
+        keep.append(i)
+        i = int(np.searchsorted(dates, dates[i] + min_gap, side="left"))
+    return np.array(keep, dtype=np.int64)
+
+def label_rolling_features(runs_df: pd.DataFrame, rolling_df: pd.DataFrame, output_csv: str = None, engine="vectorized") -> None:
+
+    runs_df = as_runs_frame(runs_df)
+    if engine == "loop":
+        return _label_rolling_features_loop(runs_df, rolling_df, output_csv)
+
+    race_runs = find_race_like_efforts(runs_df)
+    race_runs = race_runs.assign(
+        vdot=calculate_vdot(
+            distance_m=widen(race_runs["distance_km"].to_numpy()) * 1000,
+            time_sec=widen(race_runs["moving_time"].to_numpy())
+        )
+    )
+
+    # Sort by date, then keep the first race in each 21-day window
+    race_runs = race_runs.sort_values("start_date")
+    race_runs = race_runs[race_runs["start_date"].notna()]
+    race_dates = race_runs["start_date"].to_numpy(dtype="datetime64[ns]")
+    race_runs = race_runs.iloc[thin_races(race_dates)]
+
+    race_runs = race_runs[
+        (race_runs["vdot"] > 30) &
+        (race_runs["vdot"] < 80)
+    ]
+
+    # As-of join: attach the last rolling row strictly before each race
+    rolling = rolling_df
+    if not rolling["start_date"].is_monotonic_increasing:
+        rolling = rolling.sort_values("start_date", kind="mergesort")
+    rolling_dates = rolling["start_date"].to_numpy(dtype="datetime64[ns]")
+    prior = np.searchsorted(rolling_dates, race_runs["start_date"].to_numpy(dtype="datetime64[ns]"), side="left") - 1
+    has_prior = prior >= 0
+
+    labeled_df = rolling.iloc[prior[has_prior]].reset_index(drop=True)
+    labeled_df["vdot"] = race_runs["vdot"].to_numpy()[has_prior]
+
+    if output_csv:
+        write_frame(labeled_df, output_csv)
+
+    logger.debug("Labeled %d race efforts", len(labeled_df))
+
+    return labeled_df
+
+def _label_rolling_features_loop(runs_df: pd.DataFrame, rolling_df: pd.DataFrame, output_csv: str = None) -> None:
 
     runs = runs_df.copy()
     rolling = rolling_df.copy()
 
-    race_runs = find_race_like_efforts(runs)
+    race_runs = find_race_like_efforts(runs).copy()
 
     race_runs["vdot"] = race_runs.apply(
         lambda r: calculate_vdot(
@@ -75,8 +134,9 @@ def label_rolling_features(runs_df: pd.DataFrame, rolling_df: pd.DataFrame, outp
         labeled_rows.append(row)
 
     labeled_df = pd.DataFrame(labeled_rows).reset_index(drop=True)
-    labeled_df.to_csv(output_csv, index=False)
+    if output_csv:
+        write_frame(labeled_df, output_csv)
 
-    print("Final VDOT Data Saved. Graph displayed.")
+    logger.debug("Labeled %d race efforts", len(labeled_df))
 
     return labeled_df
\ No newline at end of file
@@ -0,0 +1,109 @@
+"""
+Cache of fitted VDOT forecasting models, keyed by a content hash of their inputs.
+
+Repeated forecasts over the same history (same user, different horizon)
+skip the ARIMA / StandardScaler / LinearRegression fits and go straight to
+get_forecast. Entries live in an in-memory LRU; with MODEL_CACHE_DIR set they
+are also pickled to disk so they survive restarts and are shared between
+worker processes. Only point MODEL_CACHE_DIR at a directory this service
+owns, since entries are unpickled on load.
+"""
+import hashlib
+import logging
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+logger = logging.getLogger("stryde.pipeline")
+
+MODEL_CACHE_SIZE = int(os.getenv('MODEL_CACHE_SIZE', 64))
+MODEL_CACHE_DIR = os.getenv('MODEL_CACHE_DIR')
+
+# Bump when the fitted bundle's layout or the fitting procedure changes
+CACHE_VERSION = "v2-1"
+
+VDOT_COLUMNS = ['start_date', 'vdot']
+RUN_COLUMNS = ['start_date', 'distance_km', 'average_speed', 'average_heartrate']
+
+
+def fingerprint_inputs(vdot_df: pd.DataFrame, runs_df: pd.DataFrame, *extra) -> str:
+    """SHA-256 over the columns the models are fitted from, plus any extra tokens."""
+    h = hashlib.sha256(CACHE_VERSION.encode())
+    for df, columns in ((vdot_df, VDOT_COLUMNS), (runs_df, RUN_COLUMNS)):
+        h.update(str(len(df)).encode())
+        h.update(pd.util.hash_pandas_object(df[columns], index=False).to_numpy().tobytes())
+    for token in extra:
+        h.update(repr(token).encode())
+    return h.hexdigest()
+
+
+class ModelCache:
+
+    def __init__(self, maxsize=MODEL_CACHE_SIZE, disk_dir=MODEL_CACHE_DIR):
+        self.maxsize = maxsize
+        self.disk_dir = disk_dir
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+        bundle = self._load(key)
+        with self._lock:
+            if bundle is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._insert(key, bundle)
+        return bundle
+
+    def put(self, key, bundle):
+        with self._lock:
+            self._insert(key, bundle)
+        self._store(key, bundle)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _insert(self, key, bundle):
+        self._entries[key] = bundle
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def _path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.pkl")
+
+    def _load(self, key):
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._path(key), "rb") as f:
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+
+    def _store(self, key, bundle):
+        if not self.disk_dir:
+            return
+        os.makedirs(self.disk_dir, exist_ok=True)
+        tmp = f"{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                pickle.dump(bundle, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self._path(key))
+        except OSError as e:
+            logger.warning("Could not write model cache entry %s: %s", key, e)
+
+
+default_model_cache = ModelCache()
@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+
+# (feature prefix, input column, statistic) in the order build_rolling_features emits them
+FEATURE_SPECS = [
+    ("mileage_km", "distance_km", "sum"),
+    ("mileage_miles", "distance_miles", "sum"),
+    ("run_count", "distance_km", "count"),
+    ("longest_run_km", "distance_km", "max"),
+    ("longest_run_miles", "distance_miles", "max"),
+    ("avg_pace_sec_per_km", "pace_sec_per_km", "mean"),
+    ("fastest_pace_sec_per_km", "pace_sec_per_km", "min"),
+    ("avg_pace_sec_per_mile", "pace_sec_per_mile", "mean"),
+    ("fastest_pace_sec_per_mile", "pace_sec_per_mile", "min"),
+    ("avg_hr", "average_heartrate", "mean"),
+    ("max_hr", "max_heartrate", "max"),
+    ("elevation_gain_m", "total_elevation_gain", "sum"),
+]
+
+INPUT_COLUMNS = list(dict.fromkeys(col for _, col, _ in FEATURE_SPECS))
+
+
+def window_bounds(ts: np.ndarray, window_days) -> tuple:
+    """
+    Row bounds [start, end) of the time window [t - window, t) for each
+    sorted int64 timestamp. Rows sharing a timestamp are excluded, matching
+    pandas' closed="left" time windows.
+    """
+    span = pd.Timedelta(days=window_days).value
+    start = np.searchsorted(ts, ts - span, side="left")
+    end = np.searchsorted(ts, ts, side="left")
+    return start, end
+
+
+def _range_extremes(values: np.ndarray, bounds: list, is_max: bool) -> list:
+    """
+    NaN-skipping max/min over many [start, end) ranges at once.
+
+    Works level by level through a sparse table: level k holds the extreme of
+    every run of 2**k values, and a range of length L is answered from two
+    overlapping level-floor(log2 L) blocks. Only the current level is kept in
+    memory, and every window's queries are answered in the same sweep.
+    """
+    reduce = np.fmax if is_max else np.fmin
+    n = len(values)
+    results = []
+    queries = []  # per window: rows grouped by the sparse-table level that answers them
+    max_level = -1
+    for start, end in bounds:
+        rows = np.nonzero(end > start)[0]
+        level = np.floor(np.log2(end[rows] - start[rows])).astype(np.int64)
+        order = np.argsort(level, kind="stable")
+        splits = np.cumsum(np.bincount(level, minlength=1))[:-1] if len(level) else []
+        queries.append(np.split(rows[order], splits))
+        results.append(np.full(n, np.nan))
+        if len(level):
+            max_level = max(max_level, int(level.max()))
+
+    table = values.astype(float)
+    for k in range(max_level + 1):
+        if k > 0:
+            half = 1 << (k - 1)
+            table = reduce(table[:-half], table[half:])
+        width = 1 << k
+        for (start, end), groups, out in zip(bounds, queries, results):
+            if k < len(groups) and len(groups[k]):
+                rows = groups[k]
+                out[rows] = reduce(table[start[rows]], table[end[rows] - width])
+    return results
+
+
+def rolling_aggregates(df: pd.DataFrame, windows=(14, 30)) -> pd.DataFrame:
+    """
+    Every rolling statistic for every window in one pass over a frame sorted
+    by start_date.
+
+    Sums, counts and means come from prefix sums differenced at each window's
+    bounds; max/min come from a shared sparse-table sweep. `df` must already
+    carry the derived mile and pace columns that build_rolling_features adds.
+    """
+    ts = df["start_date"].to_numpy(dtype="datetime64[ns]").astype(np.int64)
+    bounds = [window_bounds(ts, w) for w in windows]
+
+    prefix = {}
+    for col in INPUT_COLUMNS:
+        values = df[col].to_numpy(dtype=float)
+        valid = ~np.isnan(values)
+        prefix[col] = (
+            np.concatenate(([0.0], np.cumsum(np.where(valid, values, 0.0)))),
+            np.concatenate(([0], np.cumsum(valid))),
+        )
+
+    extremes = {}
+    for _, col, stat in FEATURE_SPECS:
+        if stat in ("max", "min") and (col, stat) not in extremes:
+            extremes[(col, stat)] = _range_extremes(df[col].to_numpy(dtype=float), bounds, stat == "max")
+
+    features = {}
+    for i, window in enumerate(windows):
+        start, end = bounds[i]
+        for prefix_name, col, stat in FEATURE_SPECS:
+            name = f"{prefix_name}_{window}d"
+            if stat in ("max", "min"):
+                features[name] = extremes[(col, stat)][i]
+                continue
+
+            sums, counts = prefix[col]
+            nobs = counts[end] - counts[start]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                if stat == "sum":
+                    value = sums[end] - sums[start]
+                elif stat == "count":
+                    value = nobs.astype(float)
+                else:
+                    value = (sums[end] - sums[start]) / nobs
+            features[name] = np.where(nobs > 0, value, np.nan)
+
+    return pd.DataFrame(features, index=df.index)
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+
+# Columns of the feature matrix, in order
+CONTEXT_FEATURES = ['total_distance_km', 'run_count', 'avg_speed_kmh', 'avg_hr']
+
+
+def _prefix(values):
+    """Prefix sums of the non-NaN values and of how many there are."""
+    valid = ~np.isnan(values)
+    sums = np.concatenate(([0.0], np.cumsum(np.where(valid, values, 0.0))))
+    counts = np.concatenate(([0], np.cumsum(valid)))
+    return sums, counts
+
+
+def training_context(runs_df: pd.DataFrame, dates, window_days=30):
+    """
+    Training metrics over the `window_days` before each date, for all dates at once.
+
+    Window bounds come from searchsorted on the sorted run dates and every
+    metric is a difference of prefix sums, so the cost is O((runs + dates) log runs)
+    instead of one boolean mask over all runs per date.
+
+    Returns (X, has_runs): X has one row per date and the CONTEXT_FEATURES as
+    columns; has_runs is False where the window held no runs (those rows are NaN).
+    `runs_df` must be sorted by start_date.
+    """
+    ts = runs_df['start_date'].to_numpy(dtype='datetime64[ns]')
+    dates = np.asarray(pd.to_datetime(dates), dtype='datetime64[ns]')
+
+    start = np.searchsorted(ts, dates - np.timedelta64(window_days, 'D'), side='left')
+    end = np.searchsorted(ts, dates, side='left')
+    run_count = end - start
+    has_runs = run_count > 0
+
+    distance_sums, _ = _prefix(runs_df['distance_km'].to_numpy(dtype=float))
+    speed_sums, speed_counts = _prefix(runs_df['average_speed'].to_numpy(dtype=float))
+    hr_sums, hr_counts = _prefix(runs_df['average_heartrate'].to_numpy(dtype=float))
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        X = np.column_stack([
+            distance_sums[end] - distance_sums[start],
+            run_count.astype(float),
+            (speed_sums[end] - speed_sums[start]) / (speed_counts[end] - speed_counts[start]),
+            (hr_sums[end] - hr_sums[start]) / (hr_counts[end] - hr_counts[start]),
+        ])
+    X[~has_runs] = np.nan
+    return X, has_runs
+
+
+def aggregate_training_metrics(runs_df: pd.DataFrame, start_date, window_days=30):
+    """Training metrics for the window before a single date, or None if it held no runs."""
+    X, has_runs = training_context(runs_df, [start_date], window_days=window_days)
+    if not has_runs[0]:
+        return None
+    return dict(zip(CONTEXT_FEATURES, X[0]))
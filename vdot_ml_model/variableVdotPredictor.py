@@ -1,11 +1,14 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 from datetime import datetime, timedelta
 from statsmodels.tsa.arima.model import ARIMA
 from sklearn.preprocessing import StandardScaler
 import warnings
 import json
+
+from vdot_ml_model.frameIO import load_frame
+from vdot_ml_model.trainingContext import training_context, aggregate_training_metrics
+
 warnings.filterwarnings('ignore')
 
 
@@ -13,59 +16,21 @@ def predict_vdot(vdot_csv_path, runs_csv_path, months_ahead=1, verbose=True):
     
     try:
         # Load VDOT race data
-        vdot_df = pd.read_csv(vdot_csv_path)
-        vdot_df['start_date'] = pd.to_datetime(vdot_df['start_date'])
+        vdot_df = load_frame(vdot_csv_path)
         vdot_df = vdot_df.sort_values('start_date').reset_index(drop=True)
         
         # Load training runs data
-        runs_df = pd.read_csv(runs_csv_path)
-        runs_df['start_date'] = pd.to_datetime(runs_df['start_date'])
+        runs_df = load_frame(runs_csv_path)
         runs_df = runs_df.sort_values('start_date').reset_index(drop=True)
         
         if verbose:
             print(f"Loaded {len(vdot_df)} VDOT data points and {len(runs_df)} training runs")
         
-        def aggregate_training_metrics(runs, start_date, window_days=30):
-            """
-            Aggregate training metrics for a rolling window before a date
-            """
-            window_start = start_date - timedelta(days=window_days)
-            window_runs = runs[(runs['start_date'] >= window_start) & (runs['start_date'] < start_date)]
-            
-            if len(window_runs) == 0:
-                return None
-            
-            metrics = {
-                'total_distance_km': window_runs['distance_km'].sum(),
-                'run_count': len(window_runs),
-                'avg_speed_kmh': window_runs['average_speed'].mean(),
-                'avg_hr': window_runs['average_heartrate'].mean(),
-            }
-            return metrics
-        
-        X_data = []
-        y_data = []
-        dates = []
-        
-        for idx, row in vdot_df.iterrows():
-            vdot_date = row['start_date']
-            vdot_score = row['vdot']
-            
-            agg_metrics = aggregate_training_metrics(runs_df, vdot_date, window_days=30)
-            
-            if agg_metrics is not None:
-                X_data.append([
-                    agg_metrics['total_distance_km'],
-                    agg_metrics['run_count'],
-                    agg_metrics['avg_speed_kmh'],
-                    agg_metrics['avg_hr'],
-                ])
-                y_data.append(vdot_score)
-                dates.append(vdot_date)
-        
-        X = np.array(X_data)
-        y = np.array(y_data)
-        dates = np.array(dates)
+        # 30-day pre-race training context for every VDOT observation at once
+        X, has_runs = training_context(runs_df, vdot_df['start_date'], window_days=30)
+        X = X[has_runs]
+        y = vdot_df['vdot'].to_numpy()[has_runs]
+        dates = vdot_df['start_date'].to_numpy()[has_runs]
         
         if verbose:
             print(f"\nCreated {len(y)} VDOT observations with preceding 30-day training context")
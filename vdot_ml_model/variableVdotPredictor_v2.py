@@ -1,27 +1,129 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 from datetime import datetime, timedelta
 from statsmodels.tsa.arima.model import ARIMA
 from sklearn.preprocessing import StandardScaler
 from sklearn.linear_model import LinearRegression
 import warnings
 import json
+
+from vdot_ml_model.frameIO import load_frame
+from vdot_ml_model.trainingContext import training_context, aggregate_training_metrics, CONTEXT_FEATURES
+from vdot_ml_model.modelCache import default_model_cache, fingerprint_inputs
+from getPredictions import get_times_batch, seconds_to_time, DEFAULT_DISTANCES
+
 warnings.filterwarnings('ignore')
 
 
-def predict_vdot_v2(vdot_csv_path, runs_csv_path, months_ahead=1, verbose=True):
+def fit_vdot_models_v2(vdot_df, runs_df, verbose=True):
+    """
+    Fit the ARIMA, scaler and Linear Regression models predict_vdot_v2 blends.
+
+    Expects frames already sorted by start_date. Returns a bundle with the
+    fitted models plus the last observation and the most recent training
+    context, i.e. everything a forecast needs apart from the horizon.
+    """
+    # 30-day pre-race training context for every VDOT observation at once
+    X, has_runs = training_context(runs_df, vdot_df['start_date'], window_days=30)
+    X = X[has_runs]
+    y = vdot_df['vdot'].to_numpy()[has_runs]
+    dates = vdot_df['start_date'].to_numpy()[has_runs]
+    
+    if verbose:
+        print(f"\nCreated {len(y)} VDOT observations with preceding 30-day training context")
+        print(f"VDOT range: {y.min():.2f} - {y.max():.2f}")
+    
+    # Create time series dataframe
+    ts_df = pd.DataFrame({
+        'date': dates,
+        'vdot': y,
+        'distance_km': X[:, 0],
+        'run_count': X[:, 1],
+        'avg_speed_kmh': X[:, 2],
+        'avg_hr': X[:, 3],
+    })
+    ts_df = ts_df.set_index('date')
+    
+    if verbose:
+        print("\n" + "="*70)
+        print("MODEL FITTING")
+        print("="*70)
+    
+    # Normalize features
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
+    exog_df = pd.DataFrame(
+        X_scaled,
+        columns=['distance_km_scaled', 'run_count_scaled', 'avg_speed_scaled', 'avg_hr_scaled'],
+        index=ts_df.index
+    )
+    
+    # Fit ARIMA model
+    if verbose:
+        print("\nFitting ARIMA(1,1,1) with exogenous variables...")
+    
+    try:
+        model = ARIMA(ts_df['vdot'], exog=exog_df, order=(1, 1, 1))
+        results = model.fit()
+        if verbose:
+            print("✓ ARIMA model fitted successfully")
+    except Exception as e:
+        if verbose:
+            print(f"Falling back to basic ARIMA: {e}")
+        model = ARIMA(ts_df['vdot'], order=(1, 1, 1))
+        results = model.fit()
+        exog_df = None
+    
+    # Fit Linear Regression for training-based prediction
+    if verbose:
+        print("Fitting Linear Regression model...")
+    lr_model = LinearRegression()
+    lr_model.fit(X, y)
+    if verbose:
+        print(f"✓ Linear Regression R² score: {lr_model.score(X, y):.4f}")
+    
+    last_date = ts_df.index[-1]
+    last_vdot = ts_df['vdot'].iloc[-1]
+
+    # Get recent training metrics
+    recent_metrics = aggregate_training_metrics(runs_df, last_date, window_days=30)
+
+    return {
+        'results': results,
+        'use_exog': exog_df is not None,
+        'scaler': scaler,
+        'lr_model': lr_model,
+        'last_date': last_date,
+        'last_vdot': last_vdot,
+        'recent_metrics': recent_metrics,
+    }
+
+
+def load_or_fit_models_v2(vdot_df, runs_df, cache=default_model_cache, verbose=True):
+    """Fitted bundle for this history, from `cache` when the same inputs were fitted before."""
+    cache_key = fingerprint_inputs(vdot_df, runs_df) if cache is not None else None
+    bundle = cache.get(cache_key) if cache is not None else None
+    if bundle is None:
+        bundle = fit_vdot_models_v2(vdot_df, runs_df, verbose=verbose)
+        if cache is not None:
+            cache.put(cache_key, bundle)
+    elif verbose:
+        print("Using cached models for this history")
+    return bundle
+
+
+def predict_vdot_v2(vdot_csv_path, runs_csv_path, months_ahead=1, verbose=True, cache=default_model_cache):
     """
     Predict VDOT score multiple months from today using blended ARIMA + Linear Regression model.
     
     Parameters:
     -----------
-    vdot_csv_path : str
-        Path to CSV file with VDOT race data
+    vdot_csv_path : DataFrame or str
+        VDOT race data, in memory or as a .csv/.parquet/.feather path
         Required columns: start_date, vdot
     
-    runs_csv_path : str
-        Path to CSV file with training runs data
+    runs_csv_path : DataFrame or str
+        Training runs data, in memory or as a .csv/.parquet/.feather path
         Required columns: start_date, distance_km, average_speed, average_heartrate
     
     months_ahead : int
@@ -30,6 +132,10 @@ def predict_vdot_v2(vdot_csv_path, runs_csv_path, months_ahead=1, verbose=True):
     verbose : bool
         If True, print detailed output. If False, only return JSON.
     
+    cache : ModelCache or None
+        Fitted-model cache keyed by a hash of the inputs (default: the
+        process-wide cache). Pass None to always refit.
+    
     Returns:
     --------
     dict : Forecast output containing predicted VDOT and confidence intervals
@@ -37,109 +143,21 @@ def predict_vdot_v2(vdot_csv_path, runs_csv_path, months_ahead=1, verbose=True):
     
     try:
         # Load data
-        vdot_df = pd.read_csv(vdot_csv_path)
-        vdot_df['start_date'] = pd.to_datetime(vdot_df['start_date'])
+        vdot_df = load_frame(vdot_csv_path)
         vdot_df = vdot_df.sort_values('start_date').reset_index(drop=True)
         
-        runs_df = pd.read_csv(runs_csv_path)
-        runs_df['start_date'] = pd.to_datetime(runs_df['start_date'])
+        runs_df = load_frame(runs_csv_path)
         runs_df = runs_df.sort_values('start_date').reset_index(drop=True)
         
         if verbose:
             print(f"Loaded {len(vdot_df)} VDOT data points and {len(runs_df)} training runs")
         
-        def aggregate_training_metrics(runs, start_date, window_days=30):
-            """Aggregate training metrics for a rolling window before a date"""
-            window_start = start_date - timedelta(days=window_days)
-            window_runs = runs[(runs['start_date'] >= window_start) & (runs['start_date'] < start_date)]
-            
-            if len(window_runs) == 0:
-                return None
-            
-            metrics = {
-                'total_distance_km': window_runs['distance_km'].sum(),
-                'run_count': len(window_runs),
-                'avg_speed_kmh': window_runs['average_speed'].mean(),
-                'avg_hr': window_runs['average_heartrate'].mean(),
-            }
-            return metrics
-        
-        # Prepare training data
-        X_data = []
-        y_data = []
-        dates = []
-        
-        for idx, row in vdot_df.iterrows():
-            vdot_date = row['start_date']
-            vdot_score = row['vdot']
-            agg_metrics = aggregate_training_metrics(runs_df, vdot_date, window_days=30)
-            
-            if agg_metrics is not None:
-                X_data.append([
-                    agg_metrics['total_distance_km'],
-                    agg_metrics['run_count'],
-                    agg_metrics['avg_speed_kmh'],
-                    agg_metrics['avg_hr'],
-                ])
-                y_data.append(vdot_score)
-                dates.append(vdot_date)
-        
-        X = np.array(X_data)
-        y = np.array(y_data)
-        dates = np.array(dates)
-        
-        if verbose:
-            print(f"\nCreated {len(y)} VDOT observations with preceding 30-day training context")
-            print(f"VDOT range: {y.min():.2f} - {y.max():.2f}")
-        
-        # Create time series dataframe
-        ts_df = pd.DataFrame({
-            'date': dates,
-            'vdot': y,
-            'distance_km': X[:, 0],
-            'run_count': X[:, 1],
-            'avg_speed_kmh': X[:, 2],
-            'avg_hr': X[:, 3],
-        })
-        ts_df = ts_df.set_index('date')
-        
-        if verbose:
-            print("\n" + "="*70)
-            print("MODEL FITTING")
-            print("="*70)
-        
-        # Normalize features
-        scaler = StandardScaler()
-        X_scaled = scaler.fit_transform(X)
-        exog_df = pd.DataFrame(
-            X_scaled,
-            columns=['distance_km_scaled', 'run_count_scaled', 'avg_speed_scaled', 'avg_hr_scaled'],
-            index=ts_df.index
-        )
-        
-        # Fit ARIMA model
-        if verbose:
-            print("\nFitting ARIMA(1,1,1) with exogenous variables...")
-        
-        try:
-            model = ARIMA(ts_df['vdot'], exog=exog_df, order=(1, 1, 1))
-            results = model.fit()
-            if verbose:
-                print("✓ ARIMA model fitted successfully")
-        except Exception as e:
-            if verbose:
-                print(f"Falling back to basic ARIMA: {e}")
-            model = ARIMA(ts_df['vdot'], order=(1, 1, 1))
-            results = model.fit()
-            exog_df = None
-        
-        # Fit Linear Regression for training-based prediction
-        if verbose:
-            print("Fitting Linear Regression model...")
-        lr_model = LinearRegression()
-        lr_model.fit(X, y)
-        if verbose:
-            print(f"✓ Linear Regression R² score: {lr_model.score(X, y):.4f}")
+        bundle = load_or_fit_models_v2(vdot_df, runs_df, cache=cache, verbose=verbose)
+
+        results = bundle['results']
+        scaler = bundle['scaler']
+        lr_model = bundle['lr_model']
+        recent_metrics = bundle['recent_metrics']
         
         # Make prediction
         if verbose:
@@ -147,8 +165,8 @@ def predict_vdot_v2(vdot_csv_path, runs_csv_path, months_ahead=1, verbose=True):
             print(f"{months_ahead}-MONTH AHEAD PREDICTION")
             print("="*70)
         
-        last_date = ts_df.index[-1]
-        last_vdot = ts_df['vdot'].iloc[-1]
+        last_date = bundle['last_date']
+        last_vdot = bundle['last_vdot']
         today = datetime.now()
         days_ahead = int(months_ahead * 30.44)
         future_date = today + timedelta(days=days_ahead)
@@ -157,9 +175,6 @@ def predict_vdot_v2(vdot_csv_path, runs_csv_path, months_ahead=1, verbose=True):
             print(f"\nLast VDOT recorded: {last_vdot:.2f} on {last_date.strftime('%Y-%m-%d')}")
             print(f"Prediction date:   {future_date.strftime('%Y-%m-%d')} ({months_ahead} month(s) from today)")
         
-        # Get recent training metrics
-        recent_metrics = aggregate_training_metrics(runs_df, last_date, window_days=30)
-        
         forecast_value = None
         lower_bound = None
         upper_bound = None
@@ -182,7 +197,7 @@ def predict_vdot_v2(vdot_csv_path, runs_csv_path, months_ahead=1, verbose=True):
                 columns=['distance_km_scaled', 'run_count_scaled', 'avg_speed_scaled', 'avg_hr_scaled']
             )
             
-            if exog_df is not None:
+            if bundle['use_exog']:
                 forecast_result = results.get_forecast(steps=steps_ahead, exog=future_exog)
             else:
                 forecast_result = results.get_forecast(steps=steps_ahead)
@@ -240,4 +255,91 @@ def predict_vdot_v2(vdot_csv_path, runs_csv_path, months_ahead=1, verbose=True):
         }
         if verbose:
             print(f"\n❌ Error: {e}")
-        return error_output
\ No newline at end of file
+        return error_output
+
+
+def forecast_vdot_horizons(vdot_csv_path, runs_csv_path, horizons=(1, 3, 6, 12), distances=DEFAULT_DISTANCES,
+                           verbose=False, cache=default_model_cache):
+    """
+    Forecast several horizons from one fitted model and one get_forecast call.
+
+    Each horizon is blended exactly like predict_vdot_v2 (50% ARIMA, 50%
+    Linear Regression) and read off a single get_forecast(steps=max horizon).
+    Race times for `distances` are derived from every blended VDOT in one
+    batched table lookup.
+
+    Returns:
+    --------
+    dict : last observation plus a 'horizons' list with, per horizon, the
+           predicted VDOT, 80% interval, change and formatted race times
+    """
+    
+    try:
+        vdot_df = load_frame(vdot_csv_path)
+        vdot_df = vdot_df.sort_values('start_date').reset_index(drop=True)
+        
+        runs_df = load_frame(runs_csv_path)
+        runs_df = runs_df.sort_values('start_date').reset_index(drop=True)
+        
+        bundle = load_or_fit_models_v2(vdot_df, runs_df, cache=cache, verbose=verbose)
+        recent_metrics = bundle['recent_metrics']
+        last_vdot = bundle['last_vdot']
+        today = datetime.now()
+        
+        horizons = sorted({int(h) for h in horizons})
+        steps = [max(1, h) for h in horizons]
+        
+        forecasts = []
+        if recent_metrics is not None:
+            max_steps = max(steps)
+            recent_X = np.array([[recent_metrics[name] for name in CONTEXT_FEATURES]])
+            recent_X_scaled = bundle['scaler'].transform(recent_X)
+            
+            future_exog = pd.DataFrame(
+                np.tile(recent_X_scaled, (max_steps, 1)),
+                columns=['distance_km_scaled', 'run_count_scaled', 'avg_speed_scaled', 'avg_hr_scaled']
+            )
+            
+            if bundle['use_exog']:
+                forecast_result = bundle['results'].get_forecast(steps=max_steps, exog=future_exog)
+            else:
+                forecast_result = bundle['results'].get_forecast(steps=max_steps)
+            
+            idx = np.array(steps) - 1
+            arima_forecast = np.asarray(forecast_result.predicted_mean)[idx]
+            conf_int = np.asarray(forecast_result.conf_int(alpha=0.2))[idx]
+            lr_forecast = bundle['lr_model'].predict(recent_X)[0]
+            blended = (0.5 * arima_forecast) + (0.5 * lr_forecast)
+            race_times = get_times_batch(blended, distances)
+            
+            for i, months_ahead in enumerate(horizons):
+                future_date = today + timedelta(days=int(months_ahead * 30.44))
+                forecasts.append({
+                    'months_ahead': months_ahead,
+                    'prediction_date': future_date.strftime('%Y-%m-%d'),
+                    'predicted_vdot': round(float(blended[i]), 2),
+                    'lower_bound_80pct': round(float(conf_int[i, 0]), 2),
+                    'upper_bound_80pct': round(float(conf_int[i, 1]), 2),
+                    'change': round(float(blended[i] - last_vdot), 2),
+                    'race_times': {d: seconds_to_time(race_times[d][i]) for d in distances},
+                })
+        
+        forecast_output = {
+            'last_vdot': round(float(last_vdot), 2),
+            'last_date': bundle['last_date'].strftime('%Y-%m-%d'),
+            'horizons': forecasts,
+        }
+        
+        if verbose:
+            print(json.dumps(forecast_output, indent=2))
+        
+        return forecast_output
+    
+    except Exception as e:
+        error_output = {
+            'error': str(e),
+            'message': 'Failed to generate VDOT forecast'
+        }
+        if verbose:
+            print(f"\n❌ Error: {e}")
+        return error_output
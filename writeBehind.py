@@ -0,0 +1,305 @@
+"""
+Write-behind persistence for upload results.
+
+The upload pipeline hands its RunData / RecentActivity writes to a
+WriteBehindWriter and answers as soon as the compute stages are done. A single
+worker thread flushes the writes in submission order.
+
+Writes are delivered at least once:
+- A failed write is retried with exponential backoff.
+- After the last attempt it is deferred and replayed every WRITE_SPOOL_RETRY
+  seconds until it lands.
+- With WRITE_SPOOL_DIR set, deferred writes (and anything still pending at
+  shutdown) are spooled to disk, so they survive a restart and are replayed
+  by the next process.
+The handlers must therefore be safe to repeat; the RunData and RecentActivity
+writers are.
+
+Each write carries the full desired state of one (table, user), so a newer
+write supersedes any older one still waiting for that pair in memory. A
+spooled older write stays on disk until the newer one lands, so a crash in
+between still leaves something to replay. Replay skips a spooled write while
+a newer one for the pair is pending or in flight, and the newer write's
+success removes it. An outage never replays stale data over fresh data.
+
+When max_pending writes are already waiting, submit writes inline instead.
+This applies backpressure to uploads rather than growing memory without bound.
+
+Configuration (environment):
+    DB_WRITE_BEHIND            1 to persist in the background (default), 0 inline
+    WRITE_BEHIND_MAX_PENDING   writes waiting in memory (default 64)
+    WRITE_BEHIND_RETRIES       attempts before a write is deferred (default 3)
+    WRITE_BEHIND_BACKOFF       seconds before the first retry, doubling (default 1)
+    WRITE_SPOOL_DIR            directory for deferred writes (default: memory only)
+    WRITE_SPOOL_RETRY          seconds between replays of deferred writes (default 30)
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import pandas as pd
+
+from vdot_ml_model.activityStore import ActivityStore
+
+DB_WRITE_BEHIND = os.getenv('DB_WRITE_BEHIND', '1') == '1'
+WRITE_BEHIND_MAX_PENDING = int(os.getenv('WRITE_BEHIND_MAX_PENDING', 64))
+WRITE_BEHIND_RETRIES = int(os.getenv('WRITE_BEHIND_RETRIES', 3))
+WRITE_BEHIND_BACKOFF = float(os.getenv('WRITE_BEHIND_BACKOFF', 1.0))
+WRITE_SPOOL_DIR = os.getenv('WRITE_SPOOL_DIR')
+WRITE_SPOOL_RETRY = float(os.getenv('WRITE_SPOOL_RETRY', 30))
+
+# (table, user) pairs whose last landed write id is remembered for write_state
+LANDED_MAX = 4096
+
+logger = logging.getLogger("stryde.writebehind")
+
+
+class WriteBehindWriter:
+
+    def __init__(self, handlers, max_pending=WRITE_BEHIND_MAX_PENDING, retries=WRITE_BEHIND_RETRIES,
+                 backoff=WRITE_BEHIND_BACKOFF, spool_dir=WRITE_SPOOL_DIR, spool_retry=WRITE_SPOOL_RETRY):
+        """`handlers` maps a table name to fn(frame, user=..., **options) -> write summary."""
+        self.handlers = handlers
+        self.max_pending = max_pending
+        self.retries = retries
+        self.backoff = backoff
+        self.spool_dir = spool_dir
+        self.spool_retry = spool_retry
+        self.written = 0
+        self.deferrals = 0
+        self._pending = OrderedDict()   # (table, user) -> task, oldest first
+        self._deferred = {}             # (table, user) -> task waiting for a replay (memory-only mode)
+        self._inflight = None           # (table, user) being written
+        self._inflight_task = None
+        self._landed = OrderedDict()    # (table, user) -> id of the last write that landed
+        self._cond = threading.Condition()
+        self._worker = None
+        self._closing = False
+
+    def submit(self, table, user, frame, **options):
+        """
+        Queue the write of `frame` as `user`'s `table` and return a summary
+        marked queued with its task_id; if the queue is full, write now and
+        return the result.
+        """
+        task = {
+            "id": uuid.uuid4().hex,
+            "table": table,
+            "user": user,
+            "options": options,
+            "frame": frame,
+            "submitted_at": time.time(),
+        }
+        key = (table, user)
+        with self._cond:
+            full = key not in self._pending and len(self._pending) >= self.max_pending
+            if not full:
+                self._supersede(key)
+                self._pending[key] = task
+                self._pending.move_to_end(key)
+                self._ensure_worker()
+                self._cond.notify_all()
+
+        if full:
+            logger.warning("Write-behind queue full (%d pending); writing %s inline", self.max_pending, table)
+            return self.handlers[table](frame, user=user, **options)
+        return {"table": table, "status": "queued", "task_id": task["id"], "rows": len(frame), "written": 0, "failed": 0}
+
+    def write_state(self, table, user, task_id):
+        """
+        "queued" while the write is waiting or in flight, "written" once it
+        landed, else None: deferred, superseded, or too old to remember.
+        """
+        key = (table, user)
+        with self._cond:
+            if self._inflight_task is not None and self._inflight_task["id"] == task_id:
+                return "queued"
+            task = self._pending.get(key)
+            if task is not None and task["id"] == task_id:
+                return "queued"
+            if self._landed.get(key) == task_id:
+                return "written"
+            return None
+
+    def pending(self):
+        with self._cond:
+            return len(self._pending) + (self._inflight is not None)
+
+    def deferred(self):
+        with self._cond:
+            spooled = len(self._spool_files()) if self.spool_dir else 0
+            return len(self._deferred) + spooled
+
+    def flush(self, timeout=None):
+        """Block until nothing is pending or in flight. Returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._pending or self._inflight is not None:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self, timeout=10.0):
+        """
+        Flush what can be flushed in `timeout`, then spool whatever is left,
+        including a write still in flight. If that write lands after all, its
+        success removes the spooled copy.
+        """
+        if not self.flush(timeout):
+            logger.warning("Write-behind still busy at shutdown")
+        with self._cond:
+            self._closing = True
+            leftovers = []
+            # Spooled first, so a newer pending write for the same pair overwrites it
+            if self._inflight_task is not None and self._inflight not in self._pending:
+                leftovers.append(self._inflight_task)
+            leftovers += list(self._pending.values()) + list(self._deferred.values())
+            self._pending.clear()
+            self._deferred.clear()
+            self._cond.notify_all()
+        for task in leftovers:
+            if self.spool_dir:
+                self._spool(task)
+            else:
+                logger.error("Dropping unsaved %s write for user %s (no WRITE_SPOOL_DIR)", task["table"], task["user"])
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._closing = False
+            self._worker = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        self._replay_deferred()
+        while True:
+            with self._cond:
+                while not self._pending and not self._closing:
+                    if not self._cond.wait(self.spool_retry) and (self._deferred or self.spool_dir):
+                        break
+                if self._closing:
+                    return
+                if not self._pending:
+                    task = None
+                else:
+                    key, task = self._pending.popitem(last=False)
+                    self._inflight = key
+                    self._inflight_task = task
+
+            if task is None:
+                self._replay_deferred()
+                continue
+
+            ok = self._attempt(task)
+            with self._cond:
+                self._inflight = None
+                self._inflight_task = None
+                if ok:
+                    self.written += 1
+                    self._landed[key] = task["id"]
+                    self._landed.move_to_end(key)
+                    while len(self._landed) > LANDED_MAX:
+                        self._landed.popitem(last=False)
+                    self._remove_spool(task)
+                elif key not in self._pending:
+                    # Nothing newer for this (table, user) arrived meanwhile
+                    self.deferrals += 1
+                    if self.spool_dir:
+                        self._spool(task)
+                    else:
+                        self._deferred[key] = task
+                self._cond.notify_all()
+
+    def _attempt(self, task):
+        handler = self.handlers[task["table"]]
+        for attempt in range(self.retries):
+            try:
+                summary = handler(task["frame"], user=task["user"], **task["options"])
+                if summary.get("failed", 0) == 0:
+                    return True
+                error = f"{summary['failed']} rows failed"
+            except Exception as e:
+                error = e
+            logger.warning("%s write for user %s failed (attempt %d/%d): %s",
+                           task["table"], task["user"], attempt + 1, self.retries, error)
+            if attempt + 1 < self.retries:
+                time.sleep(self.backoff * 2 ** attempt)
+        return False
+
+    def _supersede(self, key):
+        """Drop older in-memory copies of a (table, user) write; called with the lock held."""
+        self._pending.pop(key, None)
+        self._deferred.pop(key, None)
+
+    def _replay_deferred(self):
+        with self._cond:
+            for key, task in list(self._deferred.items()):
+                if key not in self._pending:
+                    self._pending[key] = task
+            self._deferred.clear()
+
+            for path in self._spool_files():
+                try:
+                    task = self._load_spool(path)
+                except (OSError, ValueError) as e:
+                    logger.error("Unreadable spool file %s: %s", path, e)
+                    continue
+                key = (task["table"], task["user"])
+                if key not in self._pending and key != self._inflight:
+                    self._pending[key] = task
+
+    def _spool_path(self, table, user):
+        return os.path.join(self.spool_dir, f"{table}-{user}.json")
+
+    def _spool_files(self):
+        if not self.spool_dir or not os.path.isdir(self.spool_dir):
+            return []
+        return sorted(
+            os.path.join(self.spool_dir, name) for name in os.listdir(self.spool_dir) if name.endswith(".json")
+        )
+
+    def _spool(self, task):
+        frame = task["frame"]
+        if isinstance(frame, ActivityStore):
+            frame = frame.to_frame(wide=True)
+        body = {key: task[key] for key in ("id", "table", "user", "options", "submitted_at")}
+        body["records"] = json.loads(frame.to_json(orient="records", date_format="iso"))
+
+        os.makedirs(self.spool_dir, exist_ok=True)
+        path = self._spool_path(task["table"], task["user"])
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(body, f)
+        os.replace(tmp, path)
+        logger.warning("Spooled %s write for user %s to %s", task["table"], task["user"], path)
+
+    def _load_spool(self, path):
+        with open(path) as f:
+            body = json.load(f)
+        frame = pd.DataFrame(body.pop("records"))
+        if "start_date" in frame.columns:
+            frame["start_date"] = pd.to_datetime(frame["start_date"])
+        return dict(body, frame=frame)
+
+    def _remove_spool(self, task):
+        """Delete the pair's spool file once `task` (or anything newer) has landed."""
+        if not self.spool_dir:
+            return
+        path = self._spool_path(task["table"], task["user"])
+        try:
+            with open(path) as f:
+                spooled = json.load(f)
+        except (OSError, ValueError):
+            return
+        if spooled.get("id") == task["id"] or spooled.get("submitted_at", 0) <= task["submitted_at"]:
+            os.remove(path)
+
+
+def register_shutdown(writer, timeout=10.0):
+    atexit.register(writer.close, timeout)
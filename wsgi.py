@@ -0,0 +1,17 @@
+"""
+WSGI entry point for production servers.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Importing this module runs app.preload() (unless STRYDE_PRELOAD=0), so with
+gunicorn's preload_app the pipeline, predictor modules and race-time tables
+are loaded once in the master before workers fork.
+"""
+import os
+
+from app import create_app, preload
+
+if os.getenv('STRYDE_PRELOAD', '1') == '1':
+    preload()
+
+app = create_app()